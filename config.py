@@ -46,8 +46,12 @@ class Config:
         else:
             TESSERACT_PATH = os.getenv('TESSERACT_PATH', '/usr/bin/tesseract')
     
-    OCR_DPI = int(os.getenv('OCR_DPI', 300))
+    OCR_DPI = int(os.getenv('OCR_DPI', 200))
+    # PDF pages whose mean tesseract confidence is below this are re-rasterized at OCR_RETRY_DPI
+    OCR_RETRY_DPI = int(os.getenv('OCR_RETRY_DPI', 300))
+    OCR_RETRY_CONFIDENCE = float(os.getenv('OCR_RETRY_CONFIDENCE', 60))
     OCR_CONFIDENCE_THRESHOLD = float(os.getenv('OCR_CONFIDENCE_THRESHOLD', 0.2))
+    OCR_MAX_WORKERS = int(os.getenv('OCR_MAX_WORKERS', min(os.cpu_count() or 1, 4)))
     
     # YOLO
     ENABLE_YOLO = os.getenv('ENABLE_YOLO', 'False').lower() == 'true'
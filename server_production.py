@@ -8,6 +8,7 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from routes.ocr_routes import ocr_blueprint
 from config import Config
+from services.json_provider import init_json_provider
 import logging
 
 logging.basicConfig(
@@ -20,6 +21,7 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config.from_object(Config)
 Config.init_app(app)
+init_json_provider(app)
 
 # Enable CORS
 CORS(app, resources={
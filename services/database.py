@@ -4,7 +4,7 @@ MongoDB Database Service - Fixed to store table in submissions
 
 from pymongo import MongoClient, ASCENDING, DESCENDING
 from pymongo.errors import ConnectionFailure, PyMongoError
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
 from bson import ObjectId
 import json
@@ -100,6 +100,32 @@ class DatabaseService:
             print(f"❌ Error saving scan: {e}")
             raise
     
+    def save_scans_batch(self, scan_datas: List[Dict[str, Any]], user_id: str = "0000") -> List[str]:
+        """
+        Save several scan results with one insert_many round-trip
+        
+        Returns: scan_ids, in input order
+        """
+        if not scan_datas:
+            return []
+        
+        try:
+            from uuid import uuid4
+            now = datetime.now(timezone.utc)
+            scan_docs = [
+                ScanDocument.from_extraction(str(uuid4()), user_id, scan_data, created_at=now)
+                for scan_data in scan_datas
+            ]
+            
+            # ordered=False: one failing document does not stop the rest
+            self.scans.insert_many(ScanDocument.to_mongo_docs(scan_docs), ordered=False)
+            print(f"✅ {len(scan_docs)} scans saved (user: {user_id})")
+            return [doc.scan_id for doc in scan_docs]
+            
+        except PyMongoError as e:
+            print(f"❌ Error saving scan batch: {e}")
+            raise
+    
     def get_scan(self, scan_id: str) -> Optional[Dict[str, Any]]:
         """Get scan by ID"""
         try:
@@ -197,13 +223,15 @@ class DatabaseService:
         try:
             from uuid import uuid4
             rescan_id = str(uuid4())
+            now = datetime.now(timezone.utc)
             
             # 🆕 Create RescanDocument with user_id
             rescan_doc = RescanDocument.from_extraction(
                 rescan_id, 
                 original_scan_id,
                 user_id,  # 🆕 Pass user_id
-                rescan_data
+                rescan_data,
+                created_at=now
             )
             
             # Convert to dict and insert
@@ -214,7 +242,7 @@ class DatabaseService:
                 {"scan_id": original_scan_id},
                 {
                     "$inc": {"rescan_count": 1},
-                    "$set": {"updated_at": datetime.utcnow()}
+                    "$set": {"updated_at": now}
                 }
             )
             
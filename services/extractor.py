@@ -2,17 +2,30 @@
 Complete OCR Extractor Service - Enhanced with Improved Classification
 Backward compatible: Old classify_document_type() unchanged, new v2 added
 """
-from services.image_preprocessor import preprocess_image, check_image_quality
+from services.image_preprocessor import (
+    preprocess_image, check_image_quality, check_image_quality_array, decode_image
+)
+from services.tesseract_confidence import (
+    extract_all_ocr_data_single_pass, summarize_ocr_data, tesseract_data_to_text,
+    image_to_data, HAVE_TESSEROCR, OCR_POOL
+)
 import io
 import re
 import os
+import logging
+import shutil
 import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Dict, Any, Tuple, Optional
 import pytesseract
 from PIL import Image
 import numpy as np
 from config import Config
 
+logger = logging.getLogger(__name__)
+
 TESSERACT_CONFIGS = {
     'default': r'--oem 3 --psm 6',
     'single_line': r'--oem 3 --psm 7',
@@ -23,6 +36,10 @@ TESSERACT_CONFIGS = {
 
 pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_PATH
 
+# Pages are OCRed on parallel threads; keep each tesseract process on one
+# OpenMP thread so they don't oversubscribe the CPU
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
 # ==================== OPTIONAL IMPORTS ====================
 try:
     from pdf2image import convert_from_bytes
@@ -37,13 +54,15 @@ except ImportError:
     HAVE_PDFPLUMBER = False
 
 try:
-    from doctr.io import DocumentFile
     from doctr.models import ocr_predictor
-    ocr_model = ocr_predictor(pretrained=True).to("cpu")
     HAVE_DOCTR = True
 except ImportError:
     HAVE_DOCTR = False
-    ocr_model = None
+
+@lru_cache(maxsize=None)
+def get_doctr_model():
+    """docTR predictor, built on first use (weights are hundreds of MB)"""
+    return ocr_predictor(pretrained=True).to("cpu")
 
 try:
     from ultralytics import YOLO
@@ -62,132 +81,238 @@ try:
 except ImportError:
     HAVE_CV2 = False
 
+try:
+    import ahocorasick
+    HAVE_AHOCORASICK = True
+except ImportError:
+    HAVE_AHOCORASICK = False
+
+
+# ==================== PATTERNS & CLASSIFICATION TABLES ====================
+
+_WS_RX = re.compile(r"\s+")
+# Every boundary str.splitlines() splits on
+_LINE_BREAK_RX = re.compile("\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+# Characters trimmed from field values: punctuation plus everything \s matches
+_TRIM_CHARS = ",.:;_-" + "".join(ch for ch in map(chr, range(0x3001)) if ch.isspace())
+_NON_ADDR_RX = re.compile(r"[^A-Za-z0-9\s,\-\./]")
+
+_NAME_CLEAN_RX = re.compile(r"[^A-Za-z\s]")
+_GRADE_RX = re.compile(r"\bA[1-4]\b|\bA1\b|\bA2\b|\bB\b|\bC\b|\bD\b|\bE\b|\bF\b", re.I)
+_MARKS_RX = re.compile(r"\b([0-9]{1,3})(?:\.\d+)?\b")
+_TABLE_MARKS_RX = re.compile(r"\b[0-9]{1,3}\b")
+_TABLE_HEADER_RX = re.compile(r"SUBJECT|GRADE|MARKS|POINT|SCORE")
+_SUBJ_STOPWORDS = ("FIRST", "SECOND", "THIRD", "FOURTH", "FIFTH", "LANGUAGE", "CURRICULAR",
+                   "CO-CURRICULAR", "AREA", "VALUE", "EDUCATION", "WORK", "&", "AND", "THE",
+                   "SUBJECT", "SUBJECTS", "GRADE", "POINT", "CODE")
+_SUBJ_PUNCT = "():-|,.\\/"
+# Subject stopwords and punctuation removed in one pass (stopwords first, so
+# CO-CURRICULAR still wins over its '-')
+_SUBJ_NOISE_RX = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, _SUBJ_STOPWORDS)) + r")\b|[" + re.escape(_SUBJ_PUNCT) + "]"
+)
+_PAN_RX = re.compile(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b")
+_PAN_NAME_RX = re.compile(r"NAME\s*[:\-]?\s*(.+)", re.I)
+_PAN_FATHER_RX = re.compile(r"FATHER'?S?\s*NAME\s*[:\-]?\s*(.+)", re.I)
+_FATHER_RX = re.compile(r"FATHER", re.I)
+
+# Lookahead so overlapping keywords (e.g. "namepic") are all reported
+_VOTER_LABEL_RX = re.compile(r"(?=(father|husband|birth|gender|epic|name|no))")
+
+_DL_DATE_RX = re.compile(r"(\d{2}[/-]\d{2}[/-]\d{4})")
+# Group 1/2/3 = which label (dob / issue_date / valid_till), group 4 = date
+_DL_LABELLED_DATE_RX = re.compile(
+    r"(?:(Date of Birth|DOB)|(Issue Date|Date of First Issue)|(Validity|Valid Till))"
+    r"[\s:]*(\d{2}[/-]\d{2}[/-]\d{4})", re.I)
+_MARKSHEET_DOB_RXS = (
+    re.compile(r"\b(?:DOB|DATE\s*OF\s*BIRTH)[\s:\-——]*([0-3]?\d[\/\-.][01]?\d[\/\-.]\d{4})\b", re.I),
+    re.compile(r"\b([0-3]?\d[\/\-.][01]?\d[\/\-.]\d{4})\b", re.I),
+)
+_AADHAAR_NUM_RX = re.compile(r"\b\d{4}\s*\d{4}\s*\d{4}\b")
+
+_V2_CLASSES = ("PAN", "Aadhaar", "Voter ID", "Driving Licence", "Marksheet")
+
+# document_type -> [(weight, pattern)] - weight added when the pattern matches
+_V2_REGEX_RULES = {
+    "PAN": [
+        (50, _PAN_RX),
+        (15, re.compile(r"\bFATHER'?S? NAME\b")),
+        (10, re.compile(r"\b\d{2}[/-]\d{2}[/-]\d{4}\b")),
+    ],
+    "Aadhaar": [
+        (50, _AADHAAR_NUM_RX),
+        (15, re.compile(r"\b(S/O|D/O|C/O)\b")),
+    ],
+    "Voter ID": [
+        (50, re.compile(r"\b[A-Z]{3,4}[0-9]{6,10}\b")),
+        (20, re.compile(r"\bEPIC\s*NO\b")),
+        (15, re.compile(r"\bPART\s*NO\b")),
+    ],
+    "Driving Licence": [
+        (50, re.compile(r"\b[A-Z]{2}[0-9O]{6,20}\b")),
+        (25, re.compile(r"\bVALID\s*(TILL|UPTO)\b")),
+        (15, re.compile(r"\b(LMV|MCWG|TRANS)\b")),
+    ],
+    "Marksheet": [
+        (50, re.compile(r"\b(A1|A2|B1|B2|C1|C2|GRADE|CGPA)\b")),
+        (20, re.compile(r"\b(SCHOOL|COLLEGE|INSTITUTE)\b")),
+        (20, re.compile(r"\bROLL\s*NO\b")),
+    ],
+}
+# Most a class can still gain from its regex rules
+_V2_REGEX_MAX = {k: sum(w for w, _ in rules) for k, rules in _V2_REGEX_RULES.items()}
+
+
+def _ascii_variant(rx: re.Pattern) -> re.Pattern:
+    """bytes twin of a str pattern, for ASCII-only text (str-mode \\s also matches \\x1c-\\x1f)"""
+    return re.compile(rx.pattern.replace(r"\s", r"[\s\x1c-\x1f]").encode("ascii"), rx.flags & ~re.UNICODE)
+
+# Same rules for pure-ASCII text: bytes patterns skip Unicode category lookups
+_V2_REGEX_RULES_ASCII = {k: [(w, _ascii_variant(rx)) for w, rx in rules]
+                         for k, rules in _V2_REGEX_RULES.items()}
+
+# (document_type, weight, keywords) - weight added once if ANY keyword hits.
+# A keyword is (phrase, window): window=None searches the whole text,
+# otherwise the phrase must lie entirely inside txt[:window].
+_V2_KEYWORD_RULES = [
+    ("PAN", 40, (("INCOME TAX", 500),)),
+    ("PAN", 30, (("PERMANENT ACCOUNT", 500),)),
+    ("PAN", 20, (("GOVT. OF INDIA INCOME TAX", None),)),
+    ("PAN", -30, (("AADHAAR", None), ("ELECTION", None), ("DRIVING", None))),
+    ("PAN", -20, (("APPLICATION", None), ("FORM", 300))),
+    ("Aadhaar", 40, (("UIDAI", 500),)),
+    ("Aadhaar", 30, (("AADHAAR", None), ("AADHAR", None))),
+    ("Aadhaar", 25, (("UNIQUE IDENTIFICATION", None),)),
+    ("Aadhaar", 20, (("GOVERNMENT OF INDIA", None),)),
+    ("Aadhaar", 10, (("VID", None),)),
+    ("Aadhaar", -30, (("INCOME TAX", None), ("ELECTION", None))),
+    ("Aadhaar", -25, (("ENROLMENT", None), ("APPLICATION", 300))),
+    ("Voter ID", 40, (("ELECTION COMMISSION", 500),)),
+    ("Voter ID", 30, (("ELECTORAL", 500),)),
+    ("Voter ID", 25, (("ELECTOR", None),)),
+    ("Voter ID", -30, (("AADHAAR", None), ("INCOME TAX", None), ("DRIVING", None))),
+    ("Driving Licence", 40, (("DRIVING LICENCE", 500), ("DRIVING LICENSE", 500))),
+    ("Driving Licence", 30, (("TRANSPORT", 500),)),
+    ("Driving Licence", 20, (("MOTOR VEHICLE", None),)),
+    ("Driving Licence", -30, (("AADHAAR", None), ("INCOME TAX", None), ("ELECTION", None))),
+    ("Driving Licence", -25, (("LEARNER", None), ("APPLICATION", 300))),
+    ("Marksheet", 40, (("BOARD OF", 500),)),
+    ("Marksheet", 35, (("EXAMINATION", 500),)),
+    ("Marksheet", 30, (("MARKS", None),)),
+    ("Marksheet", 25, (("MARKSHEET", None),)),
+    ("Marksheet", 15, (("SUBJECT", None),)),
+    ("Marksheet", -30, (("SAMPLE PAPER", None), ("PRACTICE", None))),
+]
+
+_V2_PHRASES = sorted({phrase for _, _, kws in _V2_KEYWORD_RULES for phrase, _ in kws})
+
+if HAVE_AHOCORASICK:
+    _V2_AUTOMATON = ahocorasick.Automaton()
+    for _phrase in _V2_PHRASES:
+        _V2_AUTOMATON.add_word(_phrase, _phrase)
+    _V2_AUTOMATON.make_automaton()
+else:
+    _V2_AUTOMATON = None
+
+
+def _find_keywords(txt: str) -> Dict[str, int]:
+    """Map each classification phrase in txt to the end offset of its first occurrence"""
+    hits = {}
+    if _V2_AUTOMATON is not None:
+        # Single pass over txt; matches arrive ordered by end offset
+        for end_idx, phrase in _V2_AUTOMATON.iter(txt):
+            if phrase not in hits:
+                hits[phrase] = end_idx + 1
+        return hits
+    for phrase in _V2_PHRASES:
+        pos = txt.find(phrase)
+        if pos != -1:
+            hits[phrase] = pos + len(phrase)
+    return hits
+
 
 # ==================== NEW: IMPROVED CLASSIFICATION V2 ====================
 
-def classify_document_type_v2(text: str) -> Dict[str, Any]:
+_V2_CACHE_SIZE = 128
+_V2_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_V2_CACHE_LOCK = threading.Lock()
+
+
+def classify_document_type_v2(text: str, _txt_upper: Optional[str] = None) -> Dict[str, Any]:
     """
     Improved classification with confidence scoring
     Returns: {"document_type": "PAN", "confidence": 95, "scores": {...}}
+    
+    Results are memoized per text (LRU, _V2_CACHE_SIZE entries) so retries
+    and re-classification of the same OCR output are free.
     """
     if not text or len(text.strip()) == 0:
         return {"document_type": "Unknown", "confidence": 0, "scores": {}}
     
-    txt = text.upper()
-    scores = {
-        "PAN": 0,
-        "Aadhaar": 0,
-        "Voter ID": 0,
-        "Driving Licence": 0,
-        "Marksheet": 0
-    }
+    with _V2_CACHE_LOCK:
+        result = _V2_CACHE.get(text)
+        if result is not None:
+            _V2_CACHE.move_to_end(text)
+    
+    if result is None:
+        result = _score_document_type_v2(_txt_upper if _txt_upper is not None else text.upper())
+        with _V2_CACHE_LOCK:
+            _V2_CACHE[text] = result
+            if len(_V2_CACHE) > _V2_CACHE_SIZE:
+                _V2_CACHE.popitem(last=False)
+    
+    # Hand out a copy so callers can't mutate the cached entry
+    return {**result, "scores": dict(result["scores"])}
+
+
+def _score_document_type_v2(txt: str) -> Dict[str, Any]:
+    """
+    Score upper-cased text against the v2 rule tables.
     
-    # ========== PAN SCORING ==========
-    if re.search(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b", txt):
-        scores["PAN"] += 50
-    if "INCOME TAX" in txt[:500]:
-        scores["PAN"] += 40
-    if "PERMANENT ACCOUNT" in txt[:500]:
-        scores["PAN"] += 30
-    if "GOVT. OF INDIA INCOME TAX" in txt:
-        scores["PAN"] += 20
-    if re.search(r"\bFATHER'?S? NAME\b", txt):
-        scores["PAN"] += 15
-    if re.search(r"\b\d{2}[/-]\d{2}[/-]\d{4}\b", txt):
-        scores["PAN"] += 10
-    # Penalties
-    if "AADHAAR" in txt or "ELECTION" in txt or "DRIVING" in txt:
-        scores["PAN"] -= 30
-    if "APPLICATION" in txt or "FORM" in txt[:300]:
-        scores["PAN"] -= 20
-    
-    # ========== AADHAAR SCORING ==========
-    if re.search(r"\b\d{4}\s*\d{4}\s*\d{4}\b", txt):
-        scores["Aadhaar"] += 50
-    if "UIDAI" in txt[:500]:
-        scores["Aadhaar"] += 40
-    if "AADHAAR" in txt or "AADHAR" in txt:
-        scores["Aadhaar"] += 30
-    if "UNIQUE IDENTIFICATION" in txt:
-        scores["Aadhaar"] += 25
-    if "GOVERNMENT OF INDIA" in txt:
-        scores["Aadhaar"] += 20
-    if re.search(r"\b(S/O|D/O|C/O)\b", txt):
-        scores["Aadhaar"] += 15
-    if "VID" in txt:
-        scores["Aadhaar"] += 10
-    # Penalties
-    if "INCOME TAX" in txt or "ELECTION" in txt:
-        scores["Aadhaar"] -= 30
-    if "ENROLMENT" in txt or "APPLICATION" in txt[:300]:
-        scores["Aadhaar"] -= 25
-    
-    # ========== VOTER ID SCORING ==========
-    if re.search(r"\b[A-Z]{3,4}[0-9]{6,10}\b", txt):
-        scores["Voter ID"] += 50
-    if "ELECTION COMMISSION" in txt[:500]:
-        scores["Voter ID"] += 40
-    if "ELECTORAL" in txt[:500]:
-        scores["Voter ID"] += 30
-    if "ELECTOR" in txt:
-        scores["Voter ID"] += 25
-    if re.search(r"\bEPIC\s*NO\b", txt):
-        scores["Voter ID"] += 20
-    if re.search(r"\bPART\s*NO\b", txt):
-        scores["Voter ID"] += 15
-    # Penalties
-    if "AADHAAR" in txt or "INCOME TAX" in txt or "DRIVING" in txt:
-        scores["Voter ID"] -= 30
-    
-    # ========== DRIVING LICENCE SCORING ==========
-    if re.search(r"\b[A-Z]{2}[0-9O]{6,20}\b", txt):
-        scores["Driving Licence"] += 50
-    if "DRIVING LICENCE" in txt[:500] or "DRIVING LICENSE" in txt[:500]:
-        scores["Driving Licence"] += 40
-    if "TRANSPORT" in txt[:500]:
-        scores["Driving Licence"] += 30
-    if re.search(r"\bVALID\s*(TILL|UPTO)\b", txt):
-        scores["Driving Licence"] += 25
-    if "MOTOR VEHICLE" in txt:
-        scores["Driving Licence"] += 20
-    if re.search(r"\b(LMV|MCWG|TRANS)\b", txt):
-        scores["Driving Licence"] += 15
-    # Penalties
-    if "AADHAAR" in txt or "INCOME TAX" in txt or "ELECTION" in txt:
-        scores["Driving Licence"] -= 30
-    if "LEARNER" in txt or "APPLICATION" in txt[:300]:
-        scores["Driving Licence"] -= 25
-    
-    # ========== MARKSHEET SCORING ==========
-    if re.search(r"\b(A1|A2|B1|B2|C1|C2|GRADE|CGPA)\b", txt):
-        scores["Marksheet"] += 50
-    if "BOARD OF" in txt[:500]:
-        scores["Marksheet"] += 40
-    if "EXAMINATION" in txt[:500]:
-        scores["Marksheet"] += 35
-    if "MARKS" in txt:
-        scores["Marksheet"] += 30
-    if "MARKSHEET" in txt:
-        scores["Marksheet"] += 25
-    if re.search(r"\b(SCHOOL|COLLEGE|INSTITUTE)\b", txt):
-        scores["Marksheet"] += 20
-    if re.search(r"\bROLL\s*NO\b", txt):
-        scores["Marksheet"] += 20
-    if "SUBJECT" in txt:
-        scores["Marksheet"] += 15
-    # Penalties
-    if "SAMPLE PAPER" in txt or "PRACTICE" in txt:
-        scores["Marksheet"] -= 30
+    Keyword scores are computed for every class first; regex rules only run
+    for classes that can still overtake the leader, so "scores" holds the
+    keyword-only score for classes that were ruled out early.
+    """
+    keyword_scores = dict.fromkeys(_V2_CLASSES, 0)
+    
+    hits = _find_keywords(txt)
+    for doc_type, weight, keywords in _V2_KEYWORD_RULES:
+        for phrase, window in keywords:
+            end = hits.get(phrase)
+            if end is not None and (window is None or end <= window):
+                keyword_scores[doc_type] += weight
+                break
     
     # Ensure no negative scores
-    scores = {k: max(0, v) for k, v in scores.items()}
+    scores = {k: max(0, v) for k, v in keyword_scores.items()}
+    
+    # OCR output is almost always ASCII - match regex rules on bytes then
+    if txt.isascii():
+        subject, regex_rules = txt.encode("ascii"), _V2_REGEX_RULES_ASCII
+    else:
+        subject, regex_rules = txt, _V2_REGEX_RULES
+    
+    # Score classes from the highest reachable total down and stop once no
+    # remaining class can overtake the leader (ties go to the earlier class)
+    reachable = [keyword_scores[k] + _V2_REGEX_MAX[k] for k in _V2_CLASSES]
+    best_type, best_key = None, (0, 0)
+    for i in sorted(range(len(_V2_CLASSES)), key=lambda i: (-reachable[i], i)):
+        if (reachable[i], -i) <= best_key:
+            break
+        doc_type = _V2_CLASSES[i]
+        score = keyword_scores[doc_type]
+        for weight, pattern in regex_rules[doc_type]:
+            if pattern.search(subject):
+                score += weight
+        scores[doc_type] = max(0, score)
+        if (scores[doc_type], -i) > best_key:
+            best_type, best_key = doc_type, (scores[doc_type], -i)
     
     # Find best match
-    if max(scores.values()) == 0:
+    if best_type is None:
         return {"document_type": "Unknown", "confidence": 0, "scores": scores}
     
-    best_type = max(scores, key=scores.get)
-    best_score = scores[best_type]
+    best_score = best_key[0]
     
     # Convert score to confidence (0-100)
     if best_score >= 100:
@@ -208,19 +333,19 @@ def classify_document_type_v2(text: str) -> Dict[str, Any]:
 
 # ==================== OLD CLASSIFICATION (UNCHANGED) ====================
 
-def classify_document_type(text: str) -> str:
+def classify_document_type(text: str, _txt_upper: Optional[str] = None) -> str:
     """OLD METHOD - UNCHANGED for backward compatibility"""
     if not text or len(text.strip()) == 0:
         return "Unknown"
     
-    txt = text.upper()
+    txt = _txt_upper if _txt_upper is not None else text.upper()
     
-    if re.search(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b", txt):
+    if _PAN_RX.search(txt):
         return "PAN"
     if any(keyword in txt for keyword in ["INCOME TAX", "PERMANENT ACCOUNT"]):
         return "PAN"
     
-    if re.search(r"\b\d{4}\s*\d{4}\s*\d{4}\b", txt):
+    if _AADHAAR_NUM_RX.search(txt):
         if any(keyword in txt for keyword in ["AADHAAR", "AADHAR", "UNIQUE IDENTIFICATION", "UIDAI"]):
             return "Aadhaar"
     
@@ -243,13 +368,15 @@ def classify_document_smart(text: str) -> str:
     Smart classification: Use v2 if confident (>=70%), else fallback to v1
     THIS IS CALLED BY process_document()
     """
-    v2_result = classify_document_type_v2(text)
+    # Upper-case once for both classifiers
+    txt_upper = text.upper() if text else None
+    v2_result = classify_document_type_v2(text, txt_upper)
     
     if v2_result["confidence"] >= 70:
         print(f"✅ V2 Classification: {v2_result['document_type']} ({v2_result['confidence']}%)")
         return v2_result["document_type"]
     
-    old_result = classify_document_type(text)
+    old_result = classify_document_type(text, txt_upper)
     print(f"⚠️ V1 Fallback: {old_result} (V2 was {v2_result['confidence']}% confident)")
     
     if old_result == "Unknown" and v2_result["confidence"] >= 50:
@@ -261,6 +388,21 @@ def classify_document_smart(text: str) -> str:
 
 # ==================== HELPER FUNCTIONS ====================
 
+def remove_ignore_case(s: str, needle_upper: str) -> str:
+    """Remove every occurrence of needle_upper (already upper-cased) from s, ignoring case"""
+    s_upper = s.upper()
+    if not needle_upper or needle_upper not in s_upper or len(s_upper) != len(s):
+        return s
+    parts = []
+    start = 0
+    idx = s_upper.find(needle_upper)
+    while idx != -1:
+        parts.append(s[start:idx])
+        start = idx + len(needle_upper)
+        idx = s_upper.find(needle_upper, start)
+    parts.append(s[start:])
+    return ''.join(parts)
+
 def clean_extracted_fields(fields: dict) -> dict:
     """Remove None and empty values"""
     if not isinstance(fields, dict):
@@ -269,13 +411,23 @@ def clean_extracted_fields(fields: dict) -> dict:
             for k, v in fields.items() 
             if v is not None and (not isinstance(v, str) or v.strip())}
 
+def first_lines(text: str, n: int) -> List[str]:
+    """text.splitlines()[:n] without splitting the rest of the text"""
+    if n <= 0:
+        return []
+    for count, m in enumerate(_LINE_BREAK_RX.finditer(text), 1):
+        if count == n:
+            return text[:m.end()].splitlines()
+    return text.splitlines()
+
 def safe_split_lines(text: str) -> List[str]:
-    return [ln.strip() for ln in re.split(r"[\r\n]+", text or "") if ln.strip()]
+    """Non-empty, stripped lines of text"""
+    return [ln for ln in (raw.strip() for raw in (text or "").splitlines()) if ln]
 
 def clean_value(val: str) -> Optional[str]:
     if not val:
         return None
-    return re.sub(r"^[\s,.:;_\-]+|[\s,.:;_\-]+$", "", val).strip()
+    return val.strip(_TRIM_CHARS)
 
 def flatten_doctr_blocks(blocks: List[List[str]]) -> List[str]:
     out = []
@@ -286,29 +438,28 @@ def flatten_doctr_blocks(blocks: List[List[str]]) -> List[str]:
             out.append(block.strip())
     return out
 
+_NAME_NEG_KWS = ('government', 'india', 'authority', 'unique', 'identification', 'number',
+                 'aadhaar', 'address', 'pin', 'code', 'signature', 'enrolment', 'mobile')
+_ADDRESS_NEG_KWS = ('aadhaar', 'signature', 'mobile', 'government', 'unique', 'identification',
+                    'enrolment', 'your aadhaar no', 'vid', 'pin code')
+
 def is_probable_name(text: str) -> bool:
     """Check if text looks like a real name"""
     if not text or re.fullmatch(r"[-——]+", text) or len(text.strip(" .'-")) < 3:
         return False
-    return (
-        bool(re.fullmatch(r"[A-Za-z .'-]+", text)) and
-        3 < len(text) < 50 and
-        not any(kw in text.lower() for kw in ['government', 'india', 'authority', 
-                'unique', 'identification', 'number', 'aadhaar', 'address', 
-                'pin', 'code', 'signature', 'enrolment', 'mobile'])
-    )
+    if not (re.fullmatch(r"[A-Za-z .'-]+", text) and 3 < len(text) < 50):
+        return False
+    text_l = text.lower()
+    return not any(kw in text_l for kw in _NAME_NEG_KWS)
 
 def is_probable_address_line(text: str) -> bool:
     """Check if text looks like address"""
     if not text or len(text) <= 4:
         return False
-    return (
-        re.search(r'[A-Za-z]', text) and
-        not re.fullmatch(r'[0-9 /:,.-]+', text) and
-        not any(kw in text.lower() for kw in ['aadhaar', 'signature', 'mobile', 
-                'government', 'unique', 'identification', 'enrolment', 
-                'your aadhaar no', 'vid', 'pin code'])
-    )
+    if not re.search(r'[A-Za-z]', text) or re.fullmatch(r'[0-9 /:,.-]+', text):
+        return False
+    text_l = text.lower()
+    return not any(kw in text_l for kw in _ADDRESS_NEG_KWS)
 
 def get_right_text(box, boxes, max_y_diff=40) -> Optional[str]:
     """Find text to right of label box"""
@@ -322,37 +473,49 @@ def get_right_text(box, boxes, max_y_diff=40) -> Optional[str]:
     right_texts.sort(key=lambda x: x[0])
     if right_texts:
         val = right_texts[0][1]
-        return re.sub(r"^[\s,.:;_\-]+|[\s,.:;_\-]+$", "", val).strip() if val else None
+        return val.strip(_TRIM_CHARS) if val else None
     return None
 
 def normalize_name(s: str) -> Optional[str]:
     """Normalize name"""
     if not s: return None
-    s = re.sub(r'\s+', ' ', s).strip()
-    return re.sub(r'[:\-]+$', '', s).strip()
+    s = _WS_RX.sub(' ', s).strip()
+    return s.rstrip(':-').strip()
 
 
 # ==================== OCR FUNCTIONS ====================
 
+def run_tesseract_ocr(image) -> Tuple[str, Optional[dict]]:
+    """Tesseract text + data for one image (PIL image or file path) in a single pass"""
+    try:
+        data = image_to_data(image)
+        return tesseract_data_to_text(data), data
+    except Exception:
+        return "", None
+
 def extract_image_ocr(img_bytes: bytes) -> Tuple[str, Optional[dict], Image.Image, List[str]]:
     """Extract OCR from original image"""
     
-    # OCR on ORIGINAL image first
-    img_original = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+    # Decode once; the same pixels feed tesseract, the quality check and docTR.
+    # EXIF orientation is ignored, as PIL.Image.open (tesseract's old input) did
+    img_bgr = decode_image(img_bytes, ignore_orientation=True)
+    if img_bgr is not None:
+        img_original = Image.fromarray(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB))
+    else:
+        img_original = Image.open(io.BytesIO(img_bytes)).convert("RGB")
     
-    try:
-        original_tess_text = pytesseract.image_to_string(img_original, config=TESSERACT_CONFIGS['default'])
-        original_tess_data = pytesseract.image_to_data(img_original, output_type=pytesseract.Output.DICT, 
-                                               config=TESSERACT_CONFIGS['default'])
-    except Exception as e:
-        original_tess_text, original_tess_data = "", None
+    # OCR on ORIGINAL image first
+    original_tess_text, original_tess_data = run_tesseract_ocr(img_original)
     
     # Check quality
-    quality_info = check_image_quality(img_bytes)
+    if img_bgr is not None:
+        quality_info = check_image_quality_array(img_bgr, sample_size=512)
+    else:
+        quality_info = check_image_quality(img_bytes)
     
     # Preprocess if needed
     if quality_info.get('needs_preprocessing', True):
-        img_bytes_preprocessed = preprocess_image(img_bytes)
+        img_bytes_preprocessed = preprocess_image(img_bytes, quality_info)
         img = Image.open(io.BytesIO(img_bytes_preprocessed)).convert("RGB")
     else:
         img = img_original
@@ -363,62 +526,164 @@ def extract_image_ocr(img_bytes: bytes) -> Tuple[str, Optional[dict], Image.Imag
 
     # docTR OCR (optional)
     doctr_lines = []
-    if HAVE_DOCTR and ocr_model is not None:
+    if HAVE_DOCTR:
         try:
-            from doctr.io import DocumentFile
-            doc = DocumentFile.from_images([img_bytes])  # Use original bytes
-            result = ocr_model(doc)
-            blocks = []
+            # Reuse the already decoded RGB page instead of decoding img_bytes again
+            result = get_doctr_model()([np.asarray(img_original)])
             for page in result.pages:
                 for block in page.blocks:
-                    blocks.append([" ".join([w.value for w in line.words]) for line in block.lines])
-            doctr_lines = flatten_doctr_blocks(blocks)
+                    for line in block.lines:
+                        joined = " ".join(w.value for w in line.words)
+                        if joined:
+                            doctr_lines.append(joined.strip())
         except Exception as e:
             print(f"docTR error: {e}")
 
     # ✅ CRITICAL: Must return 4-tuple
     return tess_text, tess_data, img, doctr_lines
 
-def pdf_bytes_to_images(pdf_bytes: bytes, dpi=300) -> List[Tuple[bytes, int]]:
+def extract_image_ocr_batch(images: List[bytes]) -> List[Tuple[str, Optional[dict]]]:
+    """
+    Tesseract text + data for several page images in ONE tesseract run
+    Pages are passed via an image-list file so the engine initializes once.
+    Falls back to one run per image if the batch run fails.
+    With tesserocr the engine is already resident, so pages run one by one.
+    """
+    if len(images) < 2 or HAVE_TESSEROCR:
+        return [run_tesseract_ocr(Image.open(io.BytesIO(b)).convert("RGB")) for b in images]
+    
+    tmpdir = tempfile.mkdtemp(prefix="ocr_batch_")
+    try:
+        paths = []
+        for idx, img_bytes in enumerate(images):
+            path = os.path.join(tmpdir, f"page_{idx:04d}.png")
+            with open(path, 'wb') as f:
+                f.write(img_bytes)
+            paths.append(path)
+        list_path = os.path.join(tmpdir, "pages.txt")
+        with open(list_path, 'w') as f:
+            f.write("\n".join(paths) + "\n")
+        
+        _, data = run_tesseract_ocr(list_path)
+        if data is None:
+            raise RuntimeError("batch OCR failed")
+        
+        page_data = [{k: [] for k in data} for _ in images]
+        for i, page_num in enumerate(data['page_num']):
+            page = page_data[int(page_num) - 1]
+            for k, values in data.items():
+                page[k].append(values[i])
+        for page in page_data:
+            page['page_num'] = [1] * len(page['page_num'])
+        
+        return [(tesseract_data_to_text(page), page) for page in page_data]
+    except Exception as e:
+        print(f"⚠️ Batch OCR failed ({e}), falling back to per-page OCR")
+        return [run_tesseract_ocr(Image.open(io.BytesIO(b)).convert("RGB")) for b in images]
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+def extract_pages_ocr(images: List[bytes]) -> List[Tuple[str, Optional[dict]]]:
+    """
+    OCR page images in parallel: pages are split into contiguous chunks,
+    each chunk is one batched tesseract run on its own thread.
+    Results keep page order.
+    """
+    workers = max(1, min(Config.OCR_MAX_WORKERS, len(images)))
+    if workers == 1:
+        return extract_image_ocr_batch(images)
+    
+    size = -(-len(images) // workers)
+    chunks = [images[i:i + size] for i in range(0, len(images), size)]
+    # Shared long-lived pool, so per-thread tesserocr engines survive across PDFs
+    results = OCR_POOL.map(extract_image_ocr_batch, chunks)
+    return [page for chunk in results for page in chunk]
+
+def pdf_bytes_to_images(pdf_bytes: bytes, dpi=200, first_page: int = None,
+                        last_page: int = None) -> List[Tuple[bytes, int]]:
     if not HAVE_PDF2IMAGE:
         raise RuntimeError("pdf2image not installed")
     
     images = []
-    pil_pages = convert_from_bytes(pdf_bytes, dpi=dpi)
+    # pdftoppm is split across processes by page range
+    pil_pages = convert_from_bytes(pdf_bytes, dpi=dpi, first_page=first_page, last_page=last_page,
+                                   thread_count=Config.OCR_MAX_WORKERS)
     for i, pil in enumerate(pil_pages):
         bio = io.BytesIO()
-        pil.save(bio, format='PNG')
-        images.append((bio.getvalue(), i + 1))
+        # Bytes are decoded again in-process; favour encode speed over size
+        pil.save(bio, format='PNG', compress_level=1)
+        images.append((bio.getvalue(), i + (first_page or 1)))
     return images
 
+def mean_tesseract_confidence(tess_data: Optional[dict]) -> Optional[float]:
+    """
+    Mean confidence of the recognized words in a tesseract data dict
+    None if no word has a positive confidence (blank / image-only page)
+    """
+    if not tess_data:
+        return None
+    confs = [float(c) for c in tess_data.get('conf', []) if float(c) > 0]
+    return sum(confs) / len(confs) if confs else None
+
+def ocr_pdf_pages(pdf_bytes: bytes) -> Tuple[List[Tuple[bytes, int]], List[Tuple[str, Optional[dict]]]]:
+    """
+    Rasterize at Config.OCR_DPI and OCR every page; pages with low
+    confidence are re-rasterized at Config.OCR_RETRY_DPI and keep
+    whichever result is more confident.
+    Returns: (page_images, page_ocr) in page order
+    """
+    page_images = pdf_bytes_to_images(pdf_bytes, dpi=Config.OCR_DPI)
+    page_ocr = extract_pages_ocr([img_bytes for img_bytes, _ in page_images])
+    
+    if Config.OCR_RETRY_DPI <= Config.OCR_DPI:
+        return page_images, page_ocr
+    
+    confs = [mean_tesseract_confidence(data) for _, data in page_ocr]
+    # Pages without any confident word (blank, separator, image-only) are not
+    # retried - a higher DPI won't find text there
+    weak = [idx for idx, conf in enumerate(confs)
+            if conf is not None and conf < Config.OCR_RETRY_CONFIDENCE]
+    if not weak:
+        return page_images, page_ocr
+    
+    def retry_page(idx):
+        page_no = page_images[idx][1]
+        try:
+            hi_res = pdf_bytes_to_images(pdf_bytes, dpi=Config.OCR_RETRY_DPI,
+                                         first_page=page_no, last_page=page_no)
+            return hi_res[0], extract_image_ocr_batch([hi_res[0][0]])[0]
+        except Exception as e:
+            print(f"⚠️ Page {page_no} re-rasterization failed: {e}")
+            return None
+    
+    # Weak pages are independent - retry them concurrently
+    retried = list(OCR_POOL.map(retry_page, weak))
+    
+    for idx, res in zip(weak, retried):
+        if res is None:
+            continue
+        retry_conf = mean_tesseract_confidence(res[1][1])
+        if retry_conf is not None and retry_conf > confs[idx]:
+            page_images[idx], page_ocr[idx] = res
+    
+    return page_images, page_ocr
+
 def extract_pdf_content(pdf_bytes: bytes) -> Tuple[str, List[List[str]]]:
     if not HAVE_PDFPLUMBER:
         return "", []
     
-    tempf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    try:
-        tempf.write(pdf_bytes)
-        tempf.flush()
-        tempf.close()
-        
-        text = ""
-        tables = []
-        with pdfplumber.open(tempf.name) as pdf:
-            page_texts = []
-            for page in pdf.pages:
-                page_texts.append(page.extract_text() or "")
-                try:
-                    for pt in page.extract_tables():
-                        tables.append(pt)
-                except:
-                    continue
-            text = "\n".join(page_texts)
-        return text, tables
-    finally:
-        try:
-            os.unlink(tempf.name)
-        except:
-            pass
+    tables = []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        page_texts = []
+        for page in pdf.pages:
+            page_texts.append(page.extract_text() or "")
+            try:
+                for pt in page.extract_tables():
+                    tables.append(pt)
+            except:
+                continue
+        text = "\n".join(page_texts)
+    return text, tables
 
 
 
@@ -447,7 +712,7 @@ def extract_aadhaar_fields(text: str, yolo_output: dict = None, rawdata: bool =
 
     # Combine all text sources
     combined_text = text or ''
-    lines = [ln.strip() for ln in combined_text.splitlines() if ln.strip()]
+    lines = safe_split_lines(combined_text)
 
     if not lines:
         return fields
@@ -482,9 +747,8 @@ def extract_aadhaar_fields(text: str, yolo_output: dict = None, rawdata: bool =
 
     # 5. CRITICAL FIX: NAME AND FATHER NAME EXTRACTION
     # Look for C/O, D/O patterns
+    cleaned = [_NAME_CLEAN_RX.sub(' ', ln).strip() for ln in lines]
     for i, line in enumerate(lines):
-        line_clean = re.sub(r'[^A-Za-z\s/]', ' ', line).strip()
-        
         # Pattern 1: "KOTTANGI CHARAN C/O: Kottangi Satya Ramakrishna"
         match = re.search(r'^([A-Z\s]{5,30})\s+(C/O|D/O|S/O|W/O)[^\w]*([A-Za-z\s]{5,50})$', line, re.I)
         if match:
@@ -503,8 +767,8 @@ def extract_aadhaar_fields(text: str, yolo_output: dict = None, rawdata: bool =
         
         # Pattern 2: Name on one line, C/O on next line
         if i + 1 < len(lines):
-            current_line_clean = re.sub(r'[^A-Za-z\s]', ' ', lines[i]).strip()
-            next_line_clean = re.sub(r'[^A-Za-z\s]', ' ', lines[i+1]).strip()
+            current_line_clean = cleaned[i]
+            next_line_clean = cleaned[i + 1]
             
             # Check if current line looks like a name and next line has C/O
             if (re.match(r'^[A-Z\s]{5,30}$', current_line_clean) and 
@@ -521,6 +785,8 @@ def extract_aadhaar_fields(text: str, yolo_output: dict = None, rawdata: bool =
                 break
 
     # 6. FIXED ADDRESS EXTRACTION
+    name_u = fields['name'].upper() if fields['name'] else None
+    father_u = fields['father_name'].upper() if fields['father_name'] else None
     address_lines = []
     address_started = False
     
@@ -543,14 +809,13 @@ def extract_aadhaar_fields(text: str, yolo_output: dict = None, rawdata: bool =
             
         if address_started:
             # Clean the line and remove name/father name if present
-            clean_line = re.sub(r'[^A-Za-z0-9\s,\-\./]', ' ', line).strip()
-            clean_line = re.sub(r'\s+', ' ', clean_line)
+            clean_line = _WS_RX.sub(' ', _NON_ADDR_RX.sub(' ', line).strip())
             
             # Remove name and father name if they appear in the address
-            if fields['name']:
-                clean_line = re.sub(fields['name'], '', clean_line, flags=re.IGNORECASE)
-            if fields['father_name']:
-                clean_line = re.sub(fields['father_name'], '', clean_line, flags=re.IGNORECASE)
+            if name_u:
+                clean_line = remove_ignore_case(clean_line, name_u)
+            if father_u:
+                clean_line = remove_ignore_case(clean_line, father_u)
             
             clean_line = clean_line.strip(' ,.-')
             
@@ -563,7 +828,7 @@ def extract_aadhaar_fields(text: str, yolo_output: dict = None, rawdata: bool =
         vtc_index = None
         
         for i, line in enumerate(lines):
-            if fields['name'] and fields['name'].upper() in line.upper():
+            if name_u and name_u in line.upper():
                 name_index = i
             if re.search(r'\bVTC\b', line, re.I):
                 vtc_index = i
@@ -571,12 +836,11 @@ def extract_aadhaar_fields(text: str, yolo_output: dict = None, rawdata: bool =
         
         if name_index is not None and vtc_index is not None:
             for i in range(name_index + 1, vtc_index):
-                line_clean = re.sub(r'[^A-Za-z0-9\s,\-\./]', ' ', lines[i]).strip()
-                line_clean = re.sub(r'\s+', ' ', line_clean)
+                line_clean = _WS_RX.sub(' ', _NON_ADDR_RX.sub(' ', lines[i]).strip())
                 
                 # Skip if it contains name or father name
-                if (fields['name'] and fields['name'].upper() in line_clean.upper()) or \
-                   (fields['father_name'] and fields['father_name'].upper() in line_clean.upper()):
+                line_clean_u = line_clean.upper()
+                if (name_u and name_u in line_clean_u) or (father_u and father_u in line_clean_u):
                     continue
                     
                 if len(line_clean) > 5 and line_clean not in address_lines:
@@ -587,6 +851,25 @@ def extract_aadhaar_fields(text: str, yolo_output: dict = None, rawdata: bool =
 
     return fields
 
+def voter_label_field(txt: str) -> Optional[str]:
+    """Which Voter ID field a lower-cased YOLO label box names (None if none)"""
+    found = set(_VOTER_LABEL_RX.findall(txt))
+    if not found:
+        return None
+    if 'name' in found and 'father' not in found and 'husband' not in found:
+        return 'name'
+    if 'father' in found:
+        return 'father_name'
+    if 'husband' in found:
+        return 'husband_name'
+    if 'birth' in found:
+        return 'dob'
+    if 'gender' in found:
+        return 'gender'
+    if 'epic' in found and 'no' in found:
+        return 'voter_id'
+    return None
+
 def extract_voter_fields(text: str, yolo_output: dict = None, rawdata: bool = False) -> dict:
     """Voter ID with YOLO label detection"""
     fields = {"voter_id": None, "name": None, "father_name": None, "husband_name": None,
@@ -602,18 +885,9 @@ def extract_voter_fields(text: str, yolo_output: dict = None, rawdata: bool = Fa
             for box in yolo_boxes:
                 txt = box.get('text', '').lower()
                 if not txt: continue
-                if 'name' in txt and 'father' not in txt and 'husband' not in txt:
-                    fields['name'] = fields['name'] or get_right_text(box, yolo_boxes)
-                elif 'father' in txt:
-                    fields['father_name'] = fields['father_name'] or get_right_text(box, yolo_boxes)
-                elif 'husband' in txt:
-                    fields['husband_name'] = fields['husband_name'] or get_right_text(box, yolo_boxes)
-                elif 'birth' in txt:
-                    fields['dob'] = fields['dob'] or get_right_text(box, yolo_boxes)
-                elif 'gender' in txt:
-                    fields['gender'] = fields['gender'] or get_right_text(box, yolo_boxes)
-                elif 'epic no' in txt or ('epic' in txt and 'no' in txt):
-                    fields['voter_id'] = fields['voter_id'] or get_right_text(box, yolo_boxes)
+                key = voter_label_field(txt)
+                if key:
+                    fields[key] = fields[key] or get_right_text(box, yolo_boxes)
             
             if any(fields.values()):
                 if rawdata:
@@ -621,7 +895,7 @@ def extract_voter_fields(text: str, yolo_output: dict = None, rawdata: bool = Fa
                 return fields
     
     # Regex fallback
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    lines = safe_split_lines(text)
     m = re.search(r"\b([A-Z]{3,4}[0-9]{6,10})\b", text) or \
         re.search(r"Epic no\.?\s*[:\-]?\s*([A-Z0-9]{6,20})", text, re.I)
     if m: fields["voter_id"] = m.group(1)
@@ -655,7 +929,7 @@ def extract_dl_fields(text: str) -> Dict[str, Any]:
     fields = {"dl_number": None, "name": None, "dob": None, "issue_date": None,
               "valid_till": None, "father_name": None, "address": None}
     if not text: return fields
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    lines = safe_split_lines(text)
     
     # DL Number
     for ln in lines:
@@ -701,17 +975,16 @@ def extract_dl_fields(text: str) -> Dict[str, Any]:
     if addr_lines: fields["address"] = ", ".join(addr_lines)
     
     # Dates - improved logic
-    all_dates = re.findall(r"(\d{2}[/-]\d{2}[/-]\d{4})", text)
-    unique_dates = sorted(set(all_dates), key=all_dates.index)
+    unique_dates = list(dict.fromkeys(_DL_DATE_RX.findall(text)))
     
-    for label, field in [("(?:Date of Birth|DOB)", "dob"), 
-                         ("(?:Issue Date|Date of First Issue)", "issue_date"),
-                         ("(?:Validity|Valid Till)", "valid_till")]:
-        m = re.search(f"{label}[\\s:]*(\d{{2}}[/-]\d{{2}}[/-]\d{{4}})", text, re.I)
-        if m:
-            fields[field] = m.group(1)
-            if m.group(1) in unique_dates:
-                unique_dates.remove(m.group(1))
+    # One scan for all labelled dates; first hit per label wins
+    for m in _DL_LABELLED_DATE_RX.finditer(text):
+        field = "dob" if m.group(1) else "issue_date" if m.group(2) else "valid_till"
+        if fields[field]:
+            continue
+        fields[field] = m.group(4)
+        if m.group(4) in unique_dates:
+            unique_dates.remove(m.group(4))
     
     if not fields["issue_date"] and unique_dates:
         fields["issue_date"] = unique_dates.pop(0)
@@ -724,7 +997,7 @@ def extract_marksheet_fields(text: str, filename: str = None, meta: Dict[str, An
     """Marksheet extraction"""
     fields = {"student_name": None, "father_name": None, "mother_name": None,
               "school_name": None, "dob": None, "roll_no": None, "year": None, "cgpa": None}
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    lines = safe_split_lines(text)
     
     # School
     for ln in lines:
@@ -750,9 +1023,8 @@ def extract_marksheet_fields(text: str, filename: str = None, meta: Dict[str, An
                 break
     
     # DOB
-    for pat in [r"\b(?:DOB|DATE\s*OF\s*BIRTH)[\s:\-——]*([0-3]?\d[\/\-.][01]?\d[\/\-.]\d{4})\b",
-                r"\b([0-3]?\d[\/\-.][01]?\d[\/\-.]\d{4})\b"]:
-        m = re.search(pat, text, re.I)
+    for pat in _MARKSHEET_DOB_RXS:
+        m = pat.search(text)
         if m:
             fields["dob"] = m.group(1)
             break
@@ -787,25 +1059,29 @@ def extract_marksheet_fields(text: str, filename: str = None, meta: Dict[str, An
 def extract_pan_fields(text: str, rawdata: bool = False) -> dict:
     """PAN extraction"""
     fields = {"pan": None, "name": None, "father_name": None, "dob": None}
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    upper_lines = [ln.upper() for ln in lines]
+    lines = safe_split_lines(text)
     
-    m = re.search(r"\b([A-Z]{5}[0-9]{4}[A-Z])\b", text.upper())
+    text_u = text.upper()
+    m = re.search(r"\b([A-Z]{5}[0-9]{4}[A-Z])\b", text_u)
     if m: fields["pan"] = m.group(1)
     
-    m = re.search(r"(DOB|DATE OF BIRTH)[:\s]*([0-9]{2}[/-][0-9]{2}[/-][0-9]{4})", text.upper())
+    m = re.search(r"(DOB|DATE OF BIRTH)[:\s]*([0-9]{2}[/-][0-9]{2}[/-][0-9]{4})", text_u)
     if m:
         fields["dob"] = m.group(2)
     else:
         m = re.search(r"\b[0-9]{2}[/-][0-9]{2}[/-][0-9]{4}\b", text)
         if m: fields["dob"] = m.group(0)
     
-    for i, ln in enumerate(upper_lines):
-        if "NAME" in ln and not fields["name"]:
-            m = re.search(r"NAME\s*[:\-]?\s*(.+)", lines[i], re.I)
-            fields["name"] = normalize_name(m.group(1)) if m else (normalize_name(lines[i+1]) if i+1 < len(lines) else None)
-        if "FATHER" in ln and not fields["father_name"]:
-            m = re.search(r"FATHER'?S?\s*NAME\s*[:\-]?\s*(.+)", lines[i], re.I)
+    for i, ln in enumerate(lines):
+        if not fields["name"]:
+            m = _PAN_NAME_RX.search(ln)
+            if m:
+                fields["name"] = normalize_name(m.group(1))
+            elif ln[-4:].upper() == "NAME":
+                # Label alone on its line - value is on the next one
+                fields["name"] = normalize_name(lines[i+1]) if i+1 < len(lines) else None
+        if not fields["father_name"] and _FATHER_RX.search(ln):
+            m = _PAN_FATHER_RX.search(ln)
             fields["father_name"] = normalize_name(m.group(1)) if m else (normalize_name(lines[i+1]) if i+1 < len(lines) else None)
     
     if rawdata: fields['rawdata'] = lines
@@ -815,10 +1091,8 @@ def clean_subject(subj: str) -> str:
     """Clean subject name from marksheet"""
     if not subj:
         return None
-    s = subj.upper()
-    s = re.sub(r"\b(FIRST|SECOND|THIRD|FOURTH|FIFTH|LANGUAGE|CURRICULAR|CO-CURRICULAR|AREA|VALUE|EDUCATION|WORK|&|AND|THE|SUBJECT|SUBJECTS|GRADE|POINT|CODE)\b", ' ', s)
-    s = re.sub(r"[\(\)\:\-\|,\.\\/]", ' ', s)
-    s = re.sub(r"\s+", ' ', s).strip()
+    s = _SUBJ_NOISE_RX.sub(' ', subj.upper())
+    s = _WS_RX.sub(' ', s).strip()
     tokens = [t for t in s.split(' ') if t]
     for tok in reversed(tokens):
         if len(tok) >= 3 and tok.isalpha():
@@ -838,8 +1112,7 @@ def parse_table_from_pdf_tables(pdf_tables: List[List[List[str]]]) -> List[Dict[
         
         header_idx = None
         for i, row in enumerate(tbl[:5]):
-            joined = " ".join([str(c).upper() for c in row if c])
-            if any(h in joined for h in ['SUBJECT', 'GRADE', 'MARKS', 'POINT', 'SCORE', 'GRADE POINT']):
+            if _TABLE_HEADER_RX.search(" ".join([str(c) for c in row if c]).upper()):
                 header_idx = i
                 break
         
@@ -872,8 +1145,8 @@ def parse_table_from_pdf_tables(pdf_tables: List[List[List[str]]]) -> List[Dict[
         else:
             for row in tbl:
                 row_join = ' '.join([str(c) for c in row if c])
-                grade_m = re.search(r"\bA[1-4]\b|\bA1\b|\bA2\b|\bB\b|\bC\b|\bD\b|\bE\b|\bF\b", row_join, re.I)
-                marks_m = re.search(r"\b[0-9]{1,3}\b", row_join)
+                grade_m = _GRADE_RX.search(row_join)
+                marks_m = _TABLE_MARKS_RX.search(row_join)
                 if grade_m and marks_m:
                     subj = row_join[:grade_m.start()].strip()
                     results.append({
@@ -891,22 +1164,23 @@ def parse_table_from_lines(lines: List[str]) -> List[Dict[str, Any]]:
     if not lines:
         return results
     
-    up_lines = [ln.upper() for ln in lines]
-    grade_regex = re.compile(r"\bA[1-4]\b|\bA1\b|\bA2\b|\bB\b|\bC\b|\bD\b|\bE\b|\bF\b", re.I)
-    marks_regex = re.compile(r"\b([0-9]{1,3})(?:\.\d+)?\b")
-    used_indices = set()
     n = len(lines)
+    # Upper-case everything in one call; fall back if a line has embedded newlines
+    up_lines = "\n".join(lines).upper().split("\n")
+    if len(up_lines) != n:
+        up_lines = [ln.upper() for ln in lines]
+    used = bytearray(n)  # 1 = line already consumed by a row
     
     for i in range(n):
-        if i in used_indices:
+        if used[i]:
             continue
         
-        window = ' '.join([lines[j] for j in range(i, min(i+4, n))])
-        up_window = window.upper()
-        g = grade_regex.search(up_window)
-        m = marks_regex.search(up_window)
+        up_window = ' '.join(up_lines[i:i + 4])
+        g = _GRADE_RX.search(up_window)
+        m = _MARKS_RX.search(up_window) if g else None
         
         if g and m:
+            window = ' '.join(lines[i:i + 4])
             subj_text = window[:g.start()].strip()
             subj_clean = clean_subject(subj_text)
             grade = g.group(0).strip()
@@ -918,12 +1192,12 @@ def parse_table_from_lines(lines: List[str]) -> List[Dict[str, Any]]:
                     'marks': marks
                 })
                 for k in range(i, min(i+4, n)):
-                    used_indices.add(k)
+                    used[k] = 1
                 continue
         
         if i+2 < n:
-            g2 = grade_regex.search(up_lines[i+1])
-            m2 = marks_regex.search(up_lines[i+2])
+            g2 = _GRADE_RX.search(up_lines[i+1])
+            m2 = _MARKS_RX.search(up_lines[i+2]) if g2 else None
             if g2 and m2:
                 subj_clean = clean_subject(lines[i])
                 grade = g2.group(0).strip()
@@ -934,25 +1208,30 @@ def parse_table_from_lines(lines: List[str]) -> List[Dict[str, Any]]:
                         'grade': grade,
                         'marks': marks
                     })
-                    used_indices.update([i, i+1, i+2])
+                    used[i] = used[i+1] = used[i+2] = 1
                     continue
     
-    seen = set()
-    dedup = []
+    # First row per (subject, grade, marks); dicts keep insertion order
+    dedup = {}
     for r in results:
-        key = (r.get('subject', '').upper(), r.get('grade', ''), r.get('marks', ''))
-        if key in seen:
-            continue
-        seen.add(key)
-        dedup.append(r)
+        dedup.setdefault((r.get('subject', '').upper(), r.get('grade', ''), r.get('marks', '')), r)
     
-    return dedup
+    return list(dedup.values())
 
 
 
 # ==================== MAIN PROCESSOR ====================
 
 
+# doc_type -> field extractor, called as extractor(text, filename)
+_FIELD_EXTRACTORS = {
+    "PAN": lambda text, filename: extract_pan_fields(text),
+    "Aadhaar": lambda text, filename: extract_aadhaar_fields(text, None),
+    "Voter ID": lambda text, filename: extract_voter_fields(text, None),
+    "Driving Licence": lambda text, filename: extract_dl_fields(text),
+    "Marksheet": lambda text, filename: extract_marksheet_fields(text, filename, {}),
+}
+
 def process_document(filename: str, content_bytes: bytes) -> Dict[str, Any]:
     """Main processing function with complete meta population"""
     result = {
@@ -976,24 +1255,22 @@ def process_document(filename: str, content_bytes: bytes) -> Dict[str, Any]:
         if is_pdf:
             full_text, pdf_tables = extract_pdf_content(content_bytes) if HAVE_PDFPLUMBER else ("", [])
             if HAVE_PDF2IMAGE:
-                page_images = pdf_bytes_to_images(content_bytes, dpi=Config.OCR_DPI)
+                # 🆕 Batched tesseract runs, pages OCRed in parallel
+                page_images, page_ocr = ocr_pdf_pages(content_bytes)
                 all_text_pages = []
-                for img_bytes, page_no in page_images:
-                    # 🆕 Capture OCR data with meta
-                    tess_text, tess_data, img, doctr_lines = extract_image_ocr(img_bytes)
+                for (img_bytes, page_no), (tess_text, tess_data) in zip(page_images, page_ocr):
                     all_text_pages.append(tess_text or "")
                     
                     # 🆕 Store Tesseract data for first page
                     if page_no == 1 and tess_data:
-                        from services.tesseract_confidence import extract_all_ocr_data_single_pass
-                        ocr_data = extract_all_ocr_data_single_pass(img_bytes)
+                        # Same config as the page OCR - summarize instead of re-running
+                        ocr_data = summarize_ocr_data(tess_data, tess_text)
                         field_ocr_confidences = {
                             'overall_stats': ocr_data.get('overall_stats', {}),
                             'word_count': len(ocr_data.get('words', []))
                         }
                         
                         # 🆕 Image quality check
-                        from services.image_preprocessor import check_image_quality
                         image_quality_info = check_image_quality(img_bytes, fast_mode=True)
                 
                 ocr_text = "\n".join(all_text_pages)
@@ -1003,9 +1280,11 @@ def process_document(filename: str, content_bytes: bytes) -> Dict[str, Any]:
             tess_text, tess_data, img, doctr_lines = extract_image_ocr(content_bytes)
             full_text = tess_text or ""
             
-            # 🆕 Extract comprehensive OCR data
-            from services.tesseract_confidence import extract_all_ocr_data_single_pass
-            ocr_data = extract_all_ocr_data_single_pass(content_bytes)
+            # 🆕 Extract comprehensive OCR data (reuse the pass above when it succeeded)
+            if tess_data:
+                ocr_data = summarize_ocr_data(tess_data, full_text)
+            else:
+                ocr_data = extract_all_ocr_data_single_pass(content_bytes)
             
             field_ocr_confidences = {
                 'overall_stats': ocr_data.get('overall_stats', {}),
@@ -1014,7 +1293,6 @@ def process_document(filename: str, content_bytes: bytes) -> Dict[str, Any]:
             }
             
             # 🆕 Image quality check
-            from services.image_preprocessor import check_image_quality
             image_quality_info = check_image_quality(content_bytes, fast_mode=True)
         
         # Classification
@@ -1022,23 +1300,16 @@ def process_document(filename: str, content_bytes: bytes) -> Dict[str, Any]:
         result['document_type'] = doc_type
         
         # Extract fields based on type
-        if doc_type == "PAN":
-            result['fields'] = extract_pan_fields(full_text)
-        elif doc_type == "Aadhaar":
-            result['fields'] = extract_aadhaar_fields(full_text, None)
-        elif doc_type == "Voter ID":
-            result['fields'] = extract_voter_fields(full_text, None)
-        elif doc_type == "Driving Licence":
-            result['fields'] = extract_dl_fields(full_text)
-        elif doc_type == "Marksheet":
-            result['fields'] = extract_marksheet_fields(full_text, filename, {})
+        extractor = _FIELD_EXTRACTORS.get(doc_type)
+        if extractor is not None:
+            result['fields'] = extractor(full_text, filename)
         
         # Calculate confidence
         total_fields = len(result['fields'])
         filled_fields = sum(1 for v in result['fields'].values() if v)
         result['confidence'] = (filled_fields / total_fields * 100) if total_fields > 0 else 0
         
-        result['raw_text_preview'] = "\n".join(full_text.splitlines()[:30])
+        result['raw_text_preview'] = "\n".join(first_lines(full_text, 30))
         
         # 🆕 POPULATE META
         result['meta'] = {
@@ -1064,9 +1335,7 @@ def process_document(filename: str, content_bytes: bytes) -> Dict[str, Any]:
         return result
     
     except Exception as e:
-        print(f"❌ Processing error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Processing error in %s: %s", filename, e)
         result['error'] = str(e)
         return result
     
@@ -1077,4 +1346,5 @@ if __name__ == "__main__":
     print(f"   - PDFPlumber: {'✅' if HAVE_PDFPLUMBER else '❌'}")
     print(f"   - docTR: {'✅' if HAVE_DOCTR else '❌'}")
     print(f"   - YOLO: {'✅' if HAVE_YOLO else '❌'}")
-    print(f"   - OpenCV: {'✅' if HAVE_CV2 else '❌'}")
\ No newline at end of file
+    print(f"   - OpenCV: {'✅' if HAVE_CV2 else '❌'}")
+    print(f"   - Aho-Corasick: {'✅' if HAVE_AHOCORASICK else '❌'}")
\ No newline at end of file
@@ -8,8 +8,9 @@ import os
 import gridfs
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List, Union, IO
 from config import Config
 from datetime import datetime, timedelta
 
@@ -63,9 +64,24 @@ class FileStorageService:
             print(f"❌ File save error: {e}")
             return {'stored': False, 'error': str(e)}
     
-    def get_file(self, scan_id: str, storage_metadata: dict) -> Optional[bytes]:
+    def save_file_batch(self, items: List[Tuple[str, bytes, str]], max_workers: int = 4) -> List[dict]:
+        """
+        Save several (scan_id, file_bytes, filename) items concurrently
+        Writes and GridFS round-trips release the GIL, so they overlap.
+        Returns: Storage metadata per item, in input order
+        """
+        if len(items) < 2:
+            return [self.save_file(*item) for item in items]
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return list(pool.map(lambda item: self.save_file(*item), items))
+    
+    def get_file(self, scan_id: str, storage_metadata: dict,
+                 stream: bool = False) -> Optional[Union[bytes, IO[bytes]]]:
         """
         Retrieve file bytes using storage metadata
+        stream=True returns an open binary file-like object instead
+        (GridFS GridOut or file handle); the caller reads and closes it.
         """
         try:
             storage_mode = storage_metadata.get('storage_mode', self.mode)
@@ -76,21 +92,24 @@ class FileStorageService:
                 gridfs_id = storage_metadata.get('gridfs_id')
                 if gridfs_id:
                     file_data = self.fs.get(ObjectId(gridfs_id))
-                    return file_data.read()
+                    return file_data if stream else file_data.read()
             else:
                 # Get from filesystem
                 file_path = storage_metadata.get('file_path')
-                if file_path and os.path.exists(file_path):
-                    with open(file_path, 'rb') as f:
-                        return f.read()
-                else:
+                if not (file_path and os.path.exists(file_path)):
                     # Fallback: try to construct path
+                    file_path = None
                     filename = storage_metadata.get('filename')
                     if filename:
-                        file_path = os.path.join(self.uploads_folder, f"{scan_id}_{filename}")
-                        if os.path.exists(file_path):
-                            with open(file_path, 'rb') as f:
-                                return f.read()
+                        candidate = os.path.join(self.uploads_folder, f"{scan_id}_{filename}")
+                        if os.path.exists(candidate):
+                            file_path = candidate
+                
+                if file_path:
+                    if stream:
+                        return open(file_path, 'rb')
+                    with open(file_path, 'rb') as f:
+                        return f.read()
             
             return None
         except Exception as e:
@@ -144,13 +163,14 @@ class FileStorageService:
             else:
                 # Delete old filesystem files
                 count = 0
-                for filename in os.listdir(self.uploads_folder):
-                    file_path = os.path.join(self.uploads_folder, filename)
-                    if os.path.isfile(file_path):
-                        file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                        if file_time < cutoff_date:
-                            os.remove(file_path)
-                            count += 1
+                # scandir entries carry the file type from the directory read
+                with os.scandir(self.uploads_folder) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            file_time = datetime.fromtimestamp(entry.stat().st_mtime)
+                            if file_time < cutoff_date:
+                                os.remove(entry.path)
+                                count += 1
                 print(f"🗑️ Cleaned {count} old files from filesystem")
         except Exception as e:
             print(f"❌ Cleanup error: {e}")
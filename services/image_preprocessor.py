@@ -4,9 +4,42 @@ Smart preprocessing: Only process if needed
 """
 import cv2
 import numpy as np
-from PIL import Image
-import io
-from typing import Tuple, Dict, Any
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Tuple, Dict, Any, Optional
+
+try:
+    import xxhash
+    HAVE_XXHASH = True
+except ImportError:
+    HAVE_XXHASH = False
+
+
+_QUALITY_CACHE_SIZE = 256
+_QUALITY_CACHE: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_QUALITY_CACHE_LOCK = threading.Lock()
+
+
+def content_digest(data: bytes) -> bytes:
+    """128-bit content hash (xxh3 if available, else blake2b)"""
+    if HAVE_XXHASH:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def decode_image(image_bytes: bytes, ignore_orientation: bool = False) -> Optional[np.ndarray]:
+    """
+    Decode image bytes to a BGR array (None if undecodable)
+    
+    ignore_orientation: keep the stored pixel layout instead of applying the
+    EXIF rotation (matches PIL.Image.open, which never rotates)
+    """
+    flags = cv2.IMREAD_COLOR | (cv2.IMREAD_IGNORE_ORIENTATION if ignore_orientation else 0)
+    try:
+        return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flags)
+    except Exception:
+        return None
 
 
 def check_image_quality(image_bytes: bytes, fast_mode: bool = True) -> Dict[str, Any]:
@@ -18,33 +51,66 @@ def check_image_quality(image_bytes: bytes, fast_mode: bool = True) -> Dict[str,
         fast_mode: If True, skip expensive calculations for good images
     
     Returns: Quality dict with metrics
+    
+    Results are cached by content hash, so the same page bytes are only
+    analysed once.
     """
-    try:
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    key = (content_digest(image_bytes), len(image_bytes), fast_mode)
+    with _QUALITY_CACHE_LOCK:
+        result = _QUALITY_CACHE.get(key)
+        if result is not None:
+            _QUALITY_CACHE.move_to_end(key)
+    
+    if result is None:
+        img = decode_image(image_bytes)
         
         if img is None:
-            return {
+            result = {
                 "quality": "unknown",
                 "quality_score": 0,
                 "needs_preprocessing": True,
                 "issues": ["Failed to decode image"]
             }
+        else:
+            result = check_image_quality_array(img, fast_mode)
         
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        with _QUALITY_CACHE_LOCK:
+            _QUALITY_CACHE[key] = result
+            if len(_QUALITY_CACHE) > _QUALITY_CACHE_SIZE:
+                _QUALITY_CACHE.popitem(last=False)
+    
+    # Callers get their own copy of the mutable parts
+    return {**result, "issues": list(result["issues"])}
+
+
+def check_image_quality_array(img: np.ndarray, fast_mode: bool = True,
+                              sample_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Same as check_image_quality() for an already decoded BGR image
+    
+    sample_size: if set, brightness/contrast are measured on an evenly
+    strided pixel sample (~sample_size px on the long side); the full image
+    is only converted when the sharpness check is needed.
+    """
+    try:
+        step = max(1, max(img.shape[:2]) // sample_size) if sample_size else 1
+        if step > 1:
+            gray = cv2.cvtColor(np.ascontiguousarray(img[::step, ::step]), cv2.COLOR_BGR2GRAY)
+        else:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
-        # 1. Quick brightness check first (very fast)
-        brightness = np.mean(gray)
+        # 1+2. Brightness and contrast in one pass over the pixels
+        mean, std = cv2.meanStdDev(gray)
+        brightness = float(mean[0, 0])
         brightness_score = 100 - abs(brightness - 127) / 1.27
         
-        # 2. Quick contrast check (fast)
-        contrast = gray.std()
+        contrast = float(std[0, 0])
         contrast_score = min(100, (contrast / 80) * 100)
         
         # 🔥 OPTIMIZATION: If brightness and contrast are good, skip expensive sharpness check
         if fast_mode and brightness_score > 80 and contrast_score > 70:
             # Image looks good - skip detailed analysis
-            height, width = gray.shape
+            height, width = img.shape[:2]
             resolution = (width, height)
             min_dim = min(width, height)
             resolution_score = min(100, (min_dim / 800) * 100)
@@ -60,6 +126,7 @@ def check_image_quality(image_bytes: bytes, fast_mode: bool = True) -> Dict[str,
                 "quality": "good",
                 "quality_score": quality_score,
                 "sharpness": 150.0,  # Estimated
+                "sharpness_score": 85.0,  # Assumed, as in quality_score
                 "brightness": float(brightness),
                 "contrast": float(contrast),
                 "resolution": resolution,
@@ -69,7 +136,11 @@ def check_image_quality(image_bytes: bytes, fast_mode: bool = True) -> Dict[str,
             }
         
         # 3. Full sharpness check (expensive - only if needed)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+        if step > 1:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # 3x3 Laplacian of uint8 fits in int16 exactly; variance = std^2
+        _, lap_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+        laplacian_var = float(lap_std[0, 0]) ** 2
         sharpness_score = min(100, (laplacian_var / 500) * 100)
         
         # 4. Resolution quality
@@ -114,6 +185,7 @@ def check_image_quality(image_bytes: bytes, fast_mode: bool = True) -> Dict[str,
             "quality": quality,
             "quality_score": quality_score,
             "sharpness": float(laplacian_var),
+            "sharpness_score": float(sharpness_score),
             "brightness": float(brightness),
             "contrast": float(contrast),
             "resolution": resolution,
@@ -156,9 +228,14 @@ def should_preprocess(quality_info: Dict[str, Any]) -> bool:
     return quality_info.get('needs_preprocessing', True)
 
 
-def preprocess_image(image_bytes: bytes) -> bytes:
+def preprocess_image(image_bytes: bytes, quality_info: Optional[Dict[str, Any]] = None) -> bytes:
     """
-    ✅ UNCHANGED: Full preprocessing pipeline
+    Full preprocessing pipeline
+    
+    quality_info (from check_image_quality) picks the denoise step: sharp
+    images (sharpness_score > 80, i.e. 0-100 scale) skip it, others get a
+    bilateral filter.
+    Without it the original non-local-means denoise is used.
     """
     try:
         nparr = np.frombuffer(image_bytes, np.uint8)
@@ -171,7 +248,12 @@ def preprocess_image(image_bytes: bytes) -> bytes:
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
         # Step 2: Noise removal
-        denoised = cv2.fastNlMeansDenoising(gray, h=10)
+        if quality_info is None:
+            denoised = cv2.fastNlMeansDenoising(gray, h=10)
+        elif quality_info.get('sharpness_score', 0) > 80:
+            denoised = gray
+        else:
+            denoised = cv2.bilateralFilter(gray, d=5, sigmaColor=50, sigmaSpace=50)
         
         # Step 3: Increase contrast (CLAHE)
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
@@ -187,12 +269,11 @@ def preprocess_image(image_bytes: bytes) -> bytes:
         kernel = np.ones((1, 1), np.uint8)
         cleaned = cv2.morphologyEx(binary_deskewed, cv2.MORPH_CLOSE, kernel)
         
-        # Convert back to bytes
-        pil_img = Image.fromarray(cleaned)
-        output = io.BytesIO()
-        pil_img.save(output, format='PNG')
-        
-        return output.getvalue()
+        # Convert back to bytes (lossless; fast DEFLATE level - it's decoded again right away)
+        ok, buf = cv2.imencode('.png', cleaned, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not ok:
+            return image_bytes
+        return buf.tobytes()
         
     except Exception as e:
         print(f"⚠️ Preprocessing failed: {e}, using original image")
@@ -202,11 +283,14 @@ def preprocess_image(image_bytes: bytes) -> bytes:
 def deskew_image(image: np.ndarray) -> np.ndarray:
     """✅ UNCHANGED: Deskew function"""
     try:
-        coords = np.column_stack(np.where(image > 0))
+        points = cv2.findNonZero(image)
         
-        if coords.size == 0:
+        if points is None:
             return image
         
+        # findNonZero yields (x, y); keep the (row, col) order np.where gave
+        coords = np.ascontiguousarray(points.reshape(-1, 2)[:, ::-1])
+        
         angle = cv2.minAreaRect(coords)[-1]
         
         if angle < -45:
@@ -238,7 +322,8 @@ if __name__ == "__main__":
     print("⚡ Smart preprocessing: Only processes if quality_score < 80")
     print("Functions:")
     print("  - check_image_quality(bytes, fast_mode) [OPTIMIZED]")
+    print("  - check_image_quality_array(ndarray, fast_mode, sample_size)")
     print("  - should_preprocess(quality_dict) [NEW]")
-    print("  - preprocess_image(bytes)")
+    print("  - preprocess_image(bytes, quality_info)")
     print("  - preprocess_with_quality(bytes) [OPTIMIZED]")
     print("  - enhance_for_ocr(bytes, aggressive)")
\ No newline at end of file
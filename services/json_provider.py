@@ -0,0 +1,61 @@
+"""
+JSON Serialization Service
+orjson-backed Flask JSON provider (falls back to Flask's stdlib encoder)
+"""
+from typing import Any, Callable, Optional
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+
+
+if HAVE_ORJSON:
+    # Datetimes and dataclasses go through Flask's default() so the output
+    # (HTTP dates, dataclasses.asdict) matches the stdlib provider
+    _ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY |
+                       orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None, sort_keys: bool = False) -> bytes:
+    """
+    Serialize obj to compact JSON bytes with orjson
+    
+    Unlike the stdlib provider, output is raw UTF-8 (no ensure_ascii
+    escaping) and NaN/Infinity are written as null.
+    """
+    if not HAVE_ORJSON:
+        raise RuntimeError("orjson not installed")
+    option = _ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(obj, default=default, option=option)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    jsonify() via orjson for compact responses
+
+    Pretty-printed (debug) responses and anything orjson rejects
+    (e.g. ints over 64 bits) use the stdlib provider.
+    """
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(obj)
+
+        try:
+            body = dumps(obj, default=self.default, sort_keys=self.sort_keys)
+        except TypeError:  # orjson.JSONEncodeError included
+            return super().response(obj)
+
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def init_json_provider(app) -> None:
+    """Use orjson for app's JSON responses when it's installed"""
+    if HAVE_ORJSON:
+        app.json = OrjsonProvider(app)
+        print("ℹ️  JSON responses: orjson")
@@ -2,12 +2,38 @@
 MongoDB Document Models/Schemas - WITH Field Normalization Built-in
 """
 
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, fields as dataclass_fields
 from enum import Enum
 
 
+def _slotted(*extra_slots: str):
+    """
+    Rebuild a dataclass with __slots__ (dataclass(slots=True) needs 3.10+)
+    
+    extra_slots: non-field attributes the class stores on instances
+    """
+    def wrap(cls):
+        names = tuple(f.name for f in dataclass_fields(cls))
+        cls_dict = dict(cls.__dict__)
+        cls_dict['__slots__'] = names + extra_slots
+        # Defaults live in the generated __init__; class attributes would clash with the slots
+        for name in names:
+            cls_dict.pop(name, None)
+        cls_dict.pop('__dict__', None)
+        cls_dict.pop('__weakref__', None)
+        slotted = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+        slotted.__qualname__ = cls.__qualname__
+        return slotted
+    return wrap
+
+
+def _utc_now() -> datetime:
+    """Current UTC time (timezone-aware)"""
+    return datetime.now(timezone.utc)
+
+
 # ==================== FIELD SCHEMA (Built into models.py) ====================
 
 DOCUMENT_FIELD_SCHEMA = {
@@ -18,6 +44,25 @@ DOCUMENT_FIELD_SCHEMA = {
     "Marksheet": ["student_name", "father_name", "mother_name", "school_name", "dob", "roll_no", "year", "cgpa"]
 }
 
+# doc_type -> (ordered field names, field name set), built once at import
+_SCHEMA = {k: (tuple(v), frozenset(v)) for k, v in DOCUMENT_FIELD_SCHEMA.items()}
+
+class _ReadOnlyDict(dict):
+    """dict that refuses in-place changes; still serializes as a plain dict"""
+    
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("shared empty field placeholder is read-only")
+    
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+    
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+# One shared, frozen placeholder for every missing field
+_EMPTY_FIELD = _ReadOnlyDict(value=None, confidence=0)
+
 
 def normalize_fields(fields: Dict[str, Any], document_type: str) -> Dict[str, Any]:
     """
@@ -30,43 +75,23 @@ def normalize_fields(fields: Dict[str, Any], document_type: str) -> Dict[str, An
     Returns:
         Normalized fields dict with all expected fields
     """
-    expected_fields = DOCUMENT_FIELD_SCHEMA.get(document_type, [])
+    entry = _SCHEMA.get(document_type)
     
-    if not expected_fields:
+    if not entry:
         return fields
     
-    normalized = {}
-    
-    # Ensure all expected fields are present
-    for field_name in expected_fields:
-        if field_name in fields:
-            field_data = fields[field_name]
-            
-            # Ensure it has confidence structure
-            if isinstance(field_data, dict):
-                normalized[field_name] = field_data
-            else:
-                normalized[field_name] = {
-                    "value": field_data,
-                    "confidence": 0
-                }
-        else:
-            # Field missing - add empty structure
-            normalized[field_name] = {
-                "value": None,
-                "confidence": 0
-            }
-    
-    # Keep any extra fields not in schema
-    for field_name, field_value in fields.items():
-        if field_name not in normalized:
-            if isinstance(field_value, dict):
-                normalized[field_name] = field_value
-            else:
-                normalized[field_name] = {
-                    "value": field_value,
-                    "confidence": 0
-                }
+    expected_fields, expected_set = entry
+    
+    # Structural fill: every expected field (empty placeholder if missing)
+    normalized = {name: fields.get(name, _EMPTY_FIELD) for name in expected_fields}
+    
+    # Extractors already emit {value, confidence}; wrap anything that doesn't
+    # (Heavy API results, older stored scans) and keep extra fields
+    for name, value in fields.items():
+        if not isinstance(value, dict):
+            normalized[name] = {"value": value, "confidence": 0}
+        elif name not in expected_set:
+            normalized[name] = value
     
     return normalized
 
@@ -101,6 +126,7 @@ class SubmissionStatus(str, Enum):
 
 # ==================== FIELD MODELS ====================
 
+@_slotted()
 @dataclass
 class FieldValue:
     """Individual field with confidence score"""
@@ -114,6 +140,7 @@ class FieldValue:
         }
 
 
+@_slotted()
 @dataclass
 class PanFields:
     """PAN Card fields"""
@@ -123,9 +150,19 @@ class PanFields:
     dob: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {k: v for k, v in asdict(self).items() if v is not None}
-
-
+        d = {}
+        if self.pan is not None:
+            d["pan"] = self.pan
+        if self.name is not None:
+            d["name"] = self.name
+        if self.father_name is not None:
+            d["father_name"] = self.father_name
+        if self.dob is not None:
+            d["dob"] = self.dob
+        return d
+
+
+@_slotted()
 @dataclass
 class AadhaarFields:
     """Aadhaar Card fields"""
@@ -138,9 +175,25 @@ class AadhaarFields:
     mobile: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {k: v for k, v in asdict(self).items() if v is not None}
-
-
+        d = {}
+        if self.aadhaar_number is not None:
+            d["aadhaar_number"] = self.aadhaar_number
+        if self.name is not None:
+            d["name"] = self.name
+        if self.dob is not None:
+            d["dob"] = self.dob
+        if self.gender is not None:
+            d["gender"] = self.gender
+        if self.father_name is not None:
+            d["father_name"] = self.father_name
+        if self.address is not None:
+            d["address"] = self.address
+        if self.mobile is not None:
+            d["mobile"] = self.mobile
+        return d
+
+
+@_slotted()
 @dataclass
 class VoterIdFields:
     """Voter ID fields"""
@@ -152,9 +205,23 @@ class VoterIdFields:
     gender: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {k: v for k, v in asdict(self).items() if v is not None}
-
-
+        d = {}
+        if self.voter_id is not None:
+            d["voter_id"] = self.voter_id
+        if self.name is not None:
+            d["name"] = self.name
+        if self.father_name is not None:
+            d["father_name"] = self.father_name
+        if self.husband_name is not None:
+            d["husband_name"] = self.husband_name
+        if self.dob is not None:
+            d["dob"] = self.dob
+        if self.gender is not None:
+            d["gender"] = self.gender
+        return d
+
+
+@_slotted()
 @dataclass
 class DrivingLicenceFields:
     """Driving Licence fields"""
@@ -167,9 +234,25 @@ class DrivingLicenceFields:
     address: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {k: v for k, v in asdict(self).items() if v is not None}
-
-
+        d = {}
+        if self.dl_number is not None:
+            d["dl_number"] = self.dl_number
+        if self.name is not None:
+            d["name"] = self.name
+        if self.dob is not None:
+            d["dob"] = self.dob
+        if self.issue_date is not None:
+            d["issue_date"] = self.issue_date
+        if self.valid_till is not None:
+            d["valid_till"] = self.valid_till
+        if self.father_name is not None:
+            d["father_name"] = self.father_name
+        if self.address is not None:
+            d["address"] = self.address
+        return d
+
+
+@_slotted()
 @dataclass
 class MarksheetFields:
     """Marksheet fields"""
@@ -183,9 +266,27 @@ class MarksheetFields:
     cgpa: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {k: v for k, v in asdict(self).items() if v is not None}
-
-
+        d = {}
+        if self.student_name is not None:
+            d["student_name"] = self.student_name
+        if self.father_name is not None:
+            d["father_name"] = self.father_name
+        if self.mother_name is not None:
+            d["mother_name"] = self.mother_name
+        if self.school_name is not None:
+            d["school_name"] = self.school_name
+        if self.dob is not None:
+            d["dob"] = self.dob
+        if self.roll_no is not None:
+            d["roll_no"] = self.roll_no
+        if self.year is not None:
+            d["year"] = self.year
+        if self.cgpa is not None:
+            d["cgpa"] = self.cgpa
+        return d
+
+
+@_slotted()
 @dataclass
 class SubjectGrade:
     """Subject with grade and marks"""
@@ -195,11 +296,23 @@ class SubjectGrade:
     max_marks: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {k: v for k, v in asdict(self).items() if v is not None}
+        d = {}
+        if self.subject is not None:
+            d["subject"] = self.subject
+        if self.grade is not None:
+            d["grade"] = self.grade
+        if self.marks is not None:
+            d["marks"] = self.marks
+        if self.max_marks is not None:
+            d["max_marks"] = self.max_marks
+        return d
 
 
 # ==================== MAIN DOCUMENT MODELS ====================
+# to_dict() methods use dict literals on purpose: constant-key literals are
+# built in one step by the interpreter and beat key-tuple/zip templates.
 
+@_slotted()
 @dataclass
 class ScanDocument:
     """
@@ -218,8 +331,8 @@ class ScanDocument:
     meta: Dict[str, Any] = field(default_factory=dict)
     extraction_summary: Dict[str, Any] = field(default_factory=dict)
     rescan_count: int = 0
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    updated_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=_utc_now)
+    updated_at: datetime = field(default_factory=_utc_now)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to MongoDB document"""
@@ -241,8 +354,15 @@ class ScanDocument:
         }
     
     @classmethod
-    def from_extraction(cls, scan_id: str, user_id: str, extraction_result: Dict[str, Any]) -> 'ScanDocument':
+    def to_mongo_docs(cls, docs: List['ScanDocument']) -> List[Dict[str, Any]]:
+        """MongoDB documents for a batch (collection.insert_many(..., ordered=False))"""
+        return [doc.to_dict() for doc in docs]
+    
+    @classmethod
+    def from_extraction(cls, scan_id: str, user_id: str, extraction_result: Dict[str, Any],
+                        created_at: Optional[datetime] = None) -> 'ScanDocument':
         """Create ScanDocument from extraction result"""
+        created_at = created_at or _utc_now()
         return cls(
             scan_id=scan_id,
             user_id=user_id,
@@ -253,10 +373,13 @@ class ScanDocument:
             confidence=extraction_result.get('confidence', 0.0),
             raw_text_preview=extraction_result.get('raw_text_preview', ''),
             meta=extraction_result.get('meta', {}),
-            extraction_summary=extraction_result.get('extraction_summary', {})
+            extraction_summary=extraction_result.get('extraction_summary', {}),
+            created_at=created_at,
+            updated_at=created_at
         )
 
 
+@_slotted()
 @dataclass
 class RescanDocument:
     """
@@ -274,7 +397,7 @@ class RescanDocument:
     raw_text_preview: str = ""
     meta: Dict[str, Any] = field(default_factory=dict)
     extraction_summary: Dict[str, Any] = field(default_factory=dict)
-    created_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=_utc_now)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to MongoDB document"""
@@ -293,9 +416,15 @@ class RescanDocument:
             "created_at": self.created_at
         }
     
+    @classmethod
+    def to_mongo_docs(cls, docs: List['RescanDocument']) -> List[Dict[str, Any]]:
+        """MongoDB documents for a batch (collection.insert_many(..., ordered=False))"""
+        return [doc.to_dict() for doc in docs]
+    
     @classmethod
     def from_extraction(cls, rescan_id: str, original_scan_id: str, user_id: str,
-                       extraction_result: Dict[str, Any]) -> 'RescanDocument':
+                       extraction_result: Dict[str, Any],
+                       created_at: Optional[datetime] = None) -> 'RescanDocument':
         """Create RescanDocument from extraction result"""
         return cls(
             rescan_id=rescan_id,
@@ -308,9 +437,11 @@ class RescanDocument:
             confidence=extraction_result.get('confidence', 0.0),
             raw_text_preview=extraction_result.get('raw_text_preview', ''),
             meta=extraction_result.get('meta', {}),
-            extraction_summary=extraction_result.get('extraction_summary', {})
+            extraction_summary=extraction_result.get('extraction_summary', {}),
+            created_at=created_at or _utc_now()
         )
     
+@_slotted()
 @dataclass
 class EditDocument:
     """
@@ -324,8 +455,8 @@ class EditDocument:
     edited_fields: Dict[str, Any]
     table: List[Dict[str, Any]] = field(default_factory=list)
     user_corrections: Dict[str, Any] = field(default_factory=dict)
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    updated_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=_utc_now)
+    updated_at: datetime = field(default_factory=_utc_now)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -341,6 +472,7 @@ class EditDocument:
         }
 
 
+@_slotted()
 @dataclass
 class SubmissionDocument:
     """
@@ -360,8 +492,8 @@ class SubmissionDocument:
     user_corrections: Dict[str, Any] = field(default_factory=dict)
     extraction_summary: Dict[str, Any] = field(default_factory=dict)
     status: str = SubmissionStatus.SUBMITTED.value
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    updated_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=_utc_now)
+    updated_at: datetime = field(default_factory=_utc_now)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to MongoDB document"""
@@ -384,8 +516,15 @@ class SubmissionDocument:
         }
     
     @classmethod
-    def from_submission_data(cls, submission_id: str, submission_data: Dict[str, Any]) -> 'SubmissionDocument':
+    def to_mongo_docs(cls, docs: List['SubmissionDocument']) -> List[Dict[str, Any]]:
+        """MongoDB documents for a batch (collection.insert_many(..., ordered=False))"""
+        return [doc.to_dict() for doc in docs]
+    
+    @classmethod
+    def from_submission_data(cls, submission_id: str, submission_data: Dict[str, Any],
+                             created_at: Optional[datetime] = None) -> 'SubmissionDocument':
         """Create SubmissionDocument from submission data"""
+        created_at = created_at or _utc_now()
         return cls(
             submission_id=submission_id,
             scan_id=submission_data.get('scan_id'),
@@ -396,14 +535,43 @@ class SubmissionDocument:
             table=submission_data.get('table', []),
             user_corrections=submission_data.get('user_corrections', {}),
             final_confidence=submission_data.get('final_confidence', 0.0),
-            extraction_summary=submission_data.get('extraction_summary', {})
+            extraction_summary=submission_data.get('extraction_summary', {}),
+            created_at=created_at,
+            updated_at=created_at
         )
 
 # ==================== RESPONSE MODELS (ORDERED) ====================
+# to_dict() bodies are written out by hand; they already compile to
+# straight-line bytecode, so exec()-generated versions gain nothing.
+
+def _memo_normalized_fields(response, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    normalize_fields() result memoized on the response instance, so a
+    response serialized more than once (DB write + HTTP reply) normalizes once
+    
+    The memo is keyed on the identity of the fields dict and on document_type:
+    reassigning either recomputes it, but in-place edits to the same dict
+    after the first to_dict() are NOT picked up.
+    """
+    doc_type = response.document_type or "Unknown"
+    memo = getattr(response, '_normalized_fields', None)
+    # Recompute if fields / document_type were reassigned since
+    if memo is not None and memo[0] is fields and memo[1] == doc_type:
+        return memo[2]
+    
+    normalized = normalize_fields(fields, doc_type)
+    response._normalized_fields = (fields, doc_type, normalized)
+    return normalized
+
 
+@_slotted('_normalized_fields')
 @dataclass
 class ScanResponse:
-    """API Response for scan operation - ORDERED FIELDS"""
+    """
+    API Response for scan operation - ORDERED FIELDS
+    Note: to_dict() memoizes the normalized fields; assign a new dict
+    instead of editing it in place after the first to_dict() call.
+    """
     success: bool
     scan_id: Optional[str] = None
     user_id: Optional[str] = None
@@ -440,7 +608,7 @@ class ScanResponse:
     
     # 4️⃣ Data (fields and table) - NORMALIZED
         if self.fields is not None:
-            normalized_fields = normalize_fields(self.fields, self.document_type or "Unknown")
+            normalized_fields = _memo_normalized_fields(self, self.fields)
             result["fields"] = normalized_fields
     
         if self.table is not None:
@@ -469,9 +637,14 @@ class ScanResponse:
     
         return result
 
+@_slotted('_normalized_fields')
 @dataclass
 class RescanResponse:
-    """API Response for rescan operation - ORDERED FIELDS"""
+    """
+    API Response for rescan operation - ORDERED FIELDS
+    Note: to_dict() memoizes the normalized fields; assign a new dict
+    instead of editing it in place after the first to_dict() call.
+    """
     success: bool
     rescan_id: Optional[str] = None
     scan_id: Optional[str] = None
@@ -511,7 +684,7 @@ class RescanResponse:
         
         # 4️⃣ Data - NORMALIZED
         if self.fields is not None:
-            normalized_fields = normalize_fields(self.fields, self.document_type or "Unknown")
+            normalized_fields = _memo_normalized_fields(self, self.fields)
             result["fields"] = normalized_fields
         
         if self.table is not None:
@@ -541,9 +714,14 @@ class RescanResponse:
         return result
 
 
+@_slotted('_normalized_fields')
 @dataclass
 class SubmissionResponse:
-    """API Response for submission operation - ORDERED FIELDS"""
+    """
+    API Response for submission operation - ORDERED FIELDS
+    Note: to_dict() memoizes the normalized verified_fields; assign a new dict
+    instead of editing it in place after the first to_dict() call.
+    """
     success: bool
     submission_id: Optional[str] = None
     scan_id: Optional[str] = None
@@ -579,7 +757,7 @@ class SubmissionResponse:
         
         # 4️⃣ Data - NORMALIZED
         if self.verified_fields is not None:
-            normalized_fields = normalize_fields(self.verified_fields, self.document_type or "Unknown")
+            normalized_fields = _memo_normalized_fields(self, self.verified_fields)
             result["verified_fields"] = normalized_fields
         
         if self.table is not None:
@@ -600,21 +778,26 @@ class SubmissionResponse:
 
 # ==================== UTILITY FUNCTIONS ====================
 
+_VALID_DOC_TYPES = frozenset(t.value for t in DocumentType)
+
+
 def validate_document_type(doc_type: str) -> bool:
     """Validate if document type is supported"""
-    return doc_type in [t.value for t in DocumentType]
+    return doc_type in _VALID_DOC_TYPES
+
+
+_FIELD_SCHEMA_MAP = {
+    DocumentType.PAN.value: PanFields,
+    DocumentType.AADHAAR.value: AadhaarFields,
+    DocumentType.VOTER_ID.value: VoterIdFields,
+    DocumentType.DRIVING_LICENCE.value: DrivingLicenceFields,
+    DocumentType.MARKSHEET.value: MarksheetFields
+}
 
 
 def get_field_schema(doc_type: str) -> Dict[str, type]:
     """Get field schema for document type"""
-    schemas = {
-        DocumentType.PAN.value: PanFields,
-        DocumentType.AADHAAR.value: AadhaarFields,
-        DocumentType.VOTER_ID.value: VoterIdFields,
-        DocumentType.DRIVING_LICENCE.value: DrivingLicenceFields,
-        DocumentType.MARKSHEET.value: MarksheetFields
-    }
-    return schemas.get(doc_type)
+    return _FIELD_SCHEMA_MAP.get(doc_type)
 
 
 if __name__ == "__main__":
@@ -4,10 +4,167 @@ Extract REAL OCR confidence from Tesseract in SINGLE PASS
 """
 import pytesseract
 from pytesseract import Output
+from pytesseract.pytesseract import file_to_dict
 import numpy as np
 from PIL import Image
 import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Any
+from config import Config
+
+# Optional: tesserocr runs Tesseract in-process (no subprocess / temp files)
+try:
+    from tesserocr import PyTessBaseAPI, PSM, OEM, RIL, iterate_level
+    HAVE_TESSEROCR = True
+except ImportError:
+    HAVE_TESSEROCR = False
+
+# Optional: numba-compiled single-pass confidence reducer
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+TESSERACT_CONFIG = '--oem 3 --psm 6'
+
+
+def _to_pil(image_input):
+    """
+    Convert bytes / ndarray input to a PIL Image (PIL Images pass through)
+    
+    Callers running several helpers on one image should convert once
+    and pass the Image, so the bytes are only decoded once.
+    """
+    if isinstance(image_input, bytes):
+        return Image.open(io.BytesIO(image_input))
+    if isinstance(image_input, np.ndarray):
+        return Image.fromarray(image_input)
+    return image_input
+
+
+# One tesserocr engine per thread (PyTessBaseAPI is not thread-safe)
+_TESS_LOCAL = threading.local()
+
+_DATA_KEYS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+              'left', 'top', 'width', 'height', 'conf', 'text')
+
+
+def _tesserocr_api():
+    """This thread's PyTessBaseAPI (model loaded once per thread)"""
+    api = getattr(_TESS_LOCAL, 'api', None)
+    if api is None:
+        api = _TESS_LOCAL.api = PyTessBaseAPI(psm=PSM.SINGLE_BLOCK, oem=OEM.DEFAULT)
+    return api
+
+
+def _tesserocr_image_to_data(image: Image.Image) -> Dict[str, list]:
+    """pytesseract-style image_to_data dict (word rows only) via tesserocr"""
+    api = _tesserocr_api()
+    api.SetImage(image)
+    api.Recognize()
+    
+    data = {k: [] for k in _DATA_KEYS}
+    ri = api.GetIterator()
+    if ri is None:
+        return data
+    
+    block = par = line = word = 0
+    for r in iterate_level(ri, RIL.WORD):
+        if r.IsAtBeginningOf(RIL.BLOCK):
+            block, par = block + 1, 0
+        if r.IsAtBeginningOf(RIL.PARA):
+            par, line = par + 1, 0
+        if r.IsAtBeginningOf(RIL.TEXTLINE):
+            line, word = line + 1, 0
+        word += 1
+        
+        box = r.BoundingBox(RIL.WORD) or (0, 0, 0, 0)
+        row = (5, 1, block, par, line, word, box[0], box[1], box[2] - box[0], box[3] - box[1],
+               int(r.Confidence(RIL.WORD)), r.GetUTF8Text(RIL.WORD) or '')
+        for key, value in zip(_DATA_KEYS, row):
+            data[key].append(value)
+    return data
+
+
+def _int_column(cells) -> list:
+    """TSV cells as ints (int(float()) like pytesseract, non-numeric cells kept)"""
+    try:
+        return list(map(int, cells))
+    except ValueError:
+        pass
+    try:
+        return [int(float(c)) for c in cells]
+    except ValueError:
+        pass
+    out = []
+    for c in cells:
+        try:
+            out.append(int(float(c)))
+        except ValueError:
+            out.append(c)
+    return out
+
+
+def parse_tesseract_tsv(tsv: str) -> Dict[str, list]:
+    """
+    Same dict as pytesseract's Output.DICT, built column-wise:
+    rows are transposed once and each column converted in one go
+    """
+    lines = tsv.strip().split('\n')
+    if len(lines) < 2:
+        return {}
+    
+    header = lines[0].split('\t')
+    rows = [line.split('\t') for line in lines[1:]]
+    if len(rows[-1]) < len(header):
+        # Trailing empty text cell is stripped off the last row
+        rows[-1].append('')
+    if any(len(row) != len(header) for row in rows):
+        return file_to_dict(tsv, '\t', -1)
+    
+    columns = list(zip(*rows))
+    result = {name: _int_column(col) for name, col in zip(header[:-1], columns[:-1])}
+    result[header[-1]] = list(columns[-1])
+    return result
+
+
+def image_to_data(image) -> Dict[str, list]:
+    """
+    Tesseract image_to_data dict ('--oem 3 --psm 6') for a PIL image
+    (or, via pytesseract, an image / image-list file path)
+    
+    Uses tesserocr when installed, else pytesseract. tesserocr results
+    only contain word-level rows (the rows every consumer here reads).
+    """
+    if HAVE_TESSEROCR and isinstance(image, Image.Image):
+        return _tesserocr_image_to_data(image)
+    tsv = pytesseract.image_to_data(image, output_type=Output.STRING, config=TESSERACT_CONFIG)
+    return parse_tesseract_tsv(tsv)
+
+
+def tesseract_data_to_text(data: dict) -> str:
+    """
+    Rebuild image_to_string-style text from image_to_data output:
+    words joined by spaces per line, a blank line between paragraphs
+    """
+    out = []
+    prev_line = prev_par = None
+    for page, block, par, line, word in zip(data['page_num'], data['block_num'], data['par_num'],
+                                            data['line_num'], data['text']):
+        word = str(word).strip()
+        if not word:
+            continue
+        line_key = (page, block, par, line)
+        if line_key == prev_line:
+            out.append(" ")
+        else:
+            if prev_line is not None:
+                out.append("\n\n" if line_key[:3] != prev_par else "\n")
+            prev_line, prev_par = line_key, line_key[:3]
+        out.append(word)
+    return "".join(out)
 
 
 # ✅ NEW: Single-pass OCR data extraction
@@ -22,69 +179,19 @@ def extract_all_ocr_data_single_pass(image_input) -> Dict[str, Any]:
             'words': list,                  # Words list
             'confidences': list,            # Confidence per word
             'overall_stats': dict,          # Overall confidence stats
-            'word_data': list              # [{word, confidence}]
+            'word_data': list,              # [{word, confidence}]
+            'lines': list                   # Same as get_line_confidence()
         }
     """
     try:
         # Convert to PIL Image if needed
-        if isinstance(image_input, bytes):
-            image = Image.open(io.BytesIO(image_input))
-        elif isinstance(image_input, np.ndarray):
-            image = Image.fromarray(image_input)
-        else:
-            image = image_input
+        image = _to_pil(image_input)
         
-        # 🔥 SINGLE PASS: Get both text and data at once
-        config = '--oem 3 --psm 6'
+        # 🔥 SINGLE PASS: Detailed data (includes text, confidence, positions);
+        # the full text is rebuilt from it instead of a second image_to_string run
+        data = image_to_data(image)
         
-        # Get full text
-        full_text = pytesseract.image_to_string(image, config=config)
-        
-        # Get detailed data (includes text, confidence, positions)
-        data = pytesseract.image_to_data(image, output_type=Output.DICT, config=config)
-        
-        # Extract words and confidences
-        words = []
-        confidences = []
-        word_data = []
-        
-        for i, text in enumerate(data['text']):
-            conf = int(data['conf'][i])
-            
-            # Skip empty text and background (-1 confidence)
-            if conf == -1 or not text.strip():
-                continue
-            
-            word = text.strip()
-            words.append(word)
-            confidences.append(conf)
-            word_data.append({'word': word, 'confidence': conf})
-        
-        # Calculate overall stats
-        if confidences:
-            overall_stats = {
-                'average': round(sum(confidences) / len(confidences), 2),
-                'median': round(float(np.median(confidences)), 2),
-                'min': min(confidences),
-                'max': max(confidences),
-                'word_count': len(confidences),
-                'low_conf_words': sum(1 for c in confidences if c < 70),
-                'high_conf_words': sum(1 for c in confidences if c >= 85)
-            }
-        else:
-            overall_stats = {
-                'average': 0.0, 'median': 0.0, 'min': 0, 'max': 0,
-                'word_count': 0, 'low_conf_words': 0, 'high_conf_words': 0
-            }
-        
-        return {
-            'text': full_text,
-            'data': data,
-            'words': words,
-            'confidences': confidences,
-            'overall_stats': overall_stats,
-            'word_data': word_data
-        }
+        return summarize_ocr_data(data, tesseract_data_to_text(data))
     
     except Exception as e:
         print(f"⚠️ Single-pass OCR failed: {e}")
@@ -92,34 +199,160 @@ def extract_all_ocr_data_single_pass(image_input) -> Dict[str, Any]:
             'text': '', 'data': None, 'words': [], 'confidences': [],
             'overall_stats': {'average': 0.0, 'median': 0.0, 'min': 0, 'max': 0, 
                             'word_count': 0, 'low_conf_words': 0, 'high_conf_words': 0},
-            'word_data': []
+            'word_data': [], 'lines': []
+        }
+
+
+# Shared OCR pool (also used by extractor's page OCR): Tesseract releases
+# the GIL, and long-lived threads keep their tesserocr engines loaded
+OCR_POOL = ThreadPoolExecutor(max_workers=Config.OCR_MAX_WORKERS, thread_name_prefix="ocr")
+
+
+def extract_all_ocr_data_batch(images: List[Any]) -> List[Dict[str, Any]]:
+    """extract_all_ocr_data_single_pass() for several images concurrently (input order kept)"""
+    if len(images) < 2:
+        return [extract_all_ocr_data_single_pass(img) for img in images]
+    return list(OCR_POOL.map(extract_all_ocr_data_single_pass, images))
+
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def _stats_kernel(a):
+        """Mean, min, max, <70 and >=85 counts of a non-empty int array in one loop"""
+        s = 0
+        mn = a[0]
+        mx = a[0]
+        low = 0
+        high = 0
+        for i in range(a.size):
+            v = a[i]
+            s += v
+            if v < mn:
+                mn = v
+            if v > mx:
+                mx = v
+            if v < 70:
+                low += 1
+            if v >= 85:
+                high += 1
+        return s / a.size, mn, mx, low, high
+
+
+def confidence_stats(confidences: List[int]) -> Dict[str, Any]:
+    """Average/median/min/max and low/high counts of word confidences"""
+    if not confidences:
+        return {
+            'average': 0.0, 'median': 0.0, 'min': 0, 'max': 0,
+            'word_count': 0, 'low_conf_words': 0, 'high_conf_words': 0
+        }
+    
+    # One array, vectorized reductions (integer sums are exact in float64)
+    arr = np.fromiter(confidences, dtype=np.int32, count=len(confidences))
+    if HAVE_NUMBA:
+        mean, mn, mx, low, high = _stats_kernel(arr)
+    else:
+        mean, mn, mx = arr.mean(), arr.min(), arr.max()
+        low, high = np.count_nonzero(arr < 70), np.count_nonzero(arr >= 85)
+    
+    return {
+        'average': round(float(mean), 2),
+        'median': round(float(np.median(arr)), 2),  # needs a sort, stays in NumPy
+        'min': int(mn),
+        'max': int(mx),
+        'word_count': int(arr.size),
+        'low_conf_words': int(low),
+        'high_conf_words': int(high)
+    }
+
+
+def _filter_word_indices(data: Dict[str, Any]) -> Tuple[List[str], List[int], List[int]]:
+    """Words, confidences and their box indices in an image_to_data dict"""
+    confs_arr = np.asarray(data['conf'], dtype=np.int32)
+    texts = data['text']
+    
+    # Only strip the boxes Tesseract actually recognised
+    words = []
+    keep = []
+    for i in np.flatnonzero(confs_arr != -1).tolist():
+        word = texts[i].strip()
+        if word:
+            words.append(word)
+            keep.append(i)
+    
+    return words, confs_arr[keep].tolist(), keep
+
+
+def filter_words(data: Dict[str, Any]) -> Tuple[List[str], List[int]]:
+    """
+    Stripped words and their confidences from an image_to_data dict,
+    skipping background (-1 confidence) and empty boxes
+    """
+    words, confidences, _ = _filter_word_indices(data)
+    return words, confidences
+
+
+def _group_lines(data: Dict[str, Any], words: List[str], confidences: List[int],
+                 indices: List[int]) -> List[Dict[str, Any]]:
+    """Per-line confidence summary of already filtered words"""
+    # Plain dict bucketing: np.unique/bincount grouping measured slower at
+    # every page size, since building the per-line output dicts dominates
+    lines = {}
+    blocks, pars, line_nums = data['block_num'], data['par_num'], data['line_num']
+    for word, conf, i in zip(words, confidences, indices):
+        line_key = (blocks[i], pars[i], line_nums[i])
+        line = lines.get(line_key)
+        if line is None:
+            line = lines[line_key] = ([], [])
+        line[0].append(conf)
+        line[1].append(word)
+    
+    result = [
+        {
+            'line_num': line_key[2],
+            'text': ' '.join(texts),
+            'avg_conf': round(sum(confs) / len(confs), 2),
+            'min_conf': min(confs),
+            'max_conf': max(confs),
+            'word_count': len(confs)
         }
+        for line_key, (confs, texts) in lines.items()
+    ]
+    return sorted(result, key=lambda x: x['line_num'])
+
+
+def build_lines_from_data(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """get_line_confidence() output for an existing image_to_data dict"""
+    return _group_lines(data, *_filter_word_indices(data))
+
+
+def summarize_ocr_data(data: Dict[str, Any], full_text: str = '') -> Dict[str, Any]:
+    """
+    Build the single-pass result from an existing image_to_data dict,
+    so callers that already ran Tesseract don't run it again
+    """
+    words, confidences, indices = _filter_word_indices(data)
+    word_data = [{'word': w, 'confidence': c} for w, c in zip(words, confidences)]
+    
+    return {
+        'text': full_text,
+        'data': data,
+        'words': words,
+        'confidences': confidences,
+        'overall_stats': confidence_stats(confidences),
+        'word_data': word_data,
+        'lines': _group_lines(data, words, confidences, indices)
+    }
 
 
 # ✅ KEEP OLD FUNCTIONS (backward compatible)
 def extract_word_confidences(image_input) -> Tuple[List[str], List[int]]:
     """Original function - still works"""
     try:
-        if isinstance(image_input, bytes):
-            image = Image.open(io.BytesIO(image_input))
-        elif isinstance(image_input, np.ndarray):
-            image = Image.fromarray(image_input)
-        else:
-            image = image_input
+        image = _to_pil(image_input)
         
-        data = pytesseract.image_to_data(image, output_type=Output.DICT, config='--oem 3 --psm 6')
+        data = image_to_data(image)
         
-        words = []
-        confidences = []
-        
-        for i, text in enumerate(data['text']):
-            conf = int(data['conf'][i])
-            if conf == -1 or not text.strip():
-                continue
-            words.append(text.strip())
-            confidences.append(conf)
-        
-        return words, confidences
+        return filter_words(data)
     
     except Exception as e:
         print(f"⚠️ Word confidence extraction failed: {e}")
@@ -130,22 +363,7 @@ def get_overall_ocr_confidence(image_input) -> Dict[str, Any]:
     """Original function - still works"""
     try:
         words, confs = extract_word_confidences(image_input)
-        
-        if not confs:
-            return {
-                'average': 0.0, 'median': 0.0, 'min': 0, 'max': 0,
-                'word_count': 0, 'low_conf_words': 0, 'high_conf_words': 0
-            }
-        
-        return {
-            'average': round(sum(confs) / len(confs), 2),
-            'median': round(float(np.median(confs)), 2),
-            'min': min(confs),
-            'max': max(confs),
-            'word_count': len(confs),
-            'low_conf_words': sum(1 for c in confs if c < 70),
-            'high_conf_words': sum(1 for c in confs if c >= 85)
-        }
+        return confidence_stats(confs)
     
     except Exception as e:
         print(f"⚠️ Overall confidence calculation failed: {e}")
@@ -166,45 +384,18 @@ def get_text_with_confidence(image_input, min_confidence: int = 0) -> List[Dict[
     ]
 
 
-def get_line_confidence(image_input) -> List[Dict[str, Any]]:
-    """Original function - still works"""
+def get_line_confidence(image_input=None, data: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """
+    Original function - still works
+    
+    Pass an existing image_to_data dict as data to skip the Tesseract call.
+    """
     try:
-        if isinstance(image_input, bytes):
-            image = Image.open(io.BytesIO(image_input))
-        elif isinstance(image_input, np.ndarray):
-            image = Image.fromarray(image_input)
-        else:
-            image = image_input
-        
-        data = pytesseract.image_to_data(image, output_type=Output.DICT, config='--oem 3 --psm 6')
+        if data is None:
+            image = _to_pil(image_input)
+            data = image_to_data(image)
         
-        from collections import defaultdict
-        lines = defaultdict(lambda: {'confs': [], 'texts': []})
-        
-        for i, text in enumerate(data['text']):
-            conf = int(data['conf'][i])
-            if conf == -1 or not text.strip():
-                continue
-            
-            line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
-            lines[line_key]['confs'].append(conf)
-            lines[line_key]['texts'].append(text.strip())
-        
-        result = []
-        for line_key, line_data in lines.items():
-            if not line_data['confs']:
-                continue
-            
-            result.append({
-                'line_num': line_key[2],
-                'text': ' '.join(line_data['texts']),
-                'avg_conf': round(sum(line_data['confs']) / len(line_data['confs']), 2),
-                'min_conf': min(line_data['confs']),
-                'max_conf': max(line_data['confs']),
-                'word_count': len(line_data['confs'])
-            })
-        
-        return sorted(result, key=lambda x: x['line_num'])
+        return build_lines_from_data(data)
     
     except Exception as e:
         print(f"⚠️ Line confidence extraction failed: {e}")
@@ -214,16 +405,17 @@ def get_line_confidence(image_input) -> List[Dict[str, Any]]:
 def get_field_confidence(image_input, field_bbox: Dict[str, int] = None) -> float:
     """Original function - still works"""
     try:
-        if isinstance(image_input, bytes):
-            image = Image.open(io.BytesIO(image_input))
-        elif isinstance(image_input, np.ndarray):
-            image = Image.fromarray(image_input)
-        else:
-            image = image_input
-        
         if field_bbox:
             x, y, w, h = field_bbox['x'], field_bbox['y'], field_bbox['w'], field_bbox['h']
-            image = image.crop((x, y, x + w, y + h))
+            in_bounds = (isinstance(image_input, np.ndarray) and x >= 0 and y >= 0 and w > 0 and h > 0
+                         and y + h <= image_input.shape[0] and x + w <= image_input.shape[1])
+            if in_bounds:
+                # Slice the array so only the field is converted (PIL pads out-of-bounds boxes)
+                image = Image.fromarray(np.ascontiguousarray(image_input[y:y + h, x:x + w]))
+            else:
+                image = _to_pil(image_input).crop((x, y, x + w, y + h))
+        else:
+            image = _to_pil(image_input)
         
         words, confs = extract_word_confidences(image)
         
@@ -242,8 +434,12 @@ if __name__ == "__main__":
     print("🆕 NEW: extract_all_ocr_data_single_pass() - Single-pass extraction")
     print("Functions:")
     print("  - extract_all_ocr_data_single_pass(image) [NEW - FASTER]")
+    print("  - extract_all_ocr_data_batch(images)")
+    print("  - summarize_ocr_data(data, text)")
+    print("  - confidence_stats(confidences)")
+    print("  - tesseract_data_to_text(data)")
     print("  - extract_word_confidences(image)")
-    print("  - get_line_confidence(image)")
+    print("  - get_line_confidence(image, data)")
     print("  - get_field_confidence(image, bbox)")
     print("  - get_overall_ocr_confidence(image)")
     print("  - get_text_with_confidence(image, min_conf)")
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+ocr_pdf_pages retry logic (pdf2image / tesseract mocked out)
+"""
+import unittest
+from unittest import mock
+
+from config import Config
+import services.extractor as extractor
+
+
+def _tess_data(confs):
+    return {'conf': list(confs), 'text': ['w'] * len(confs)}
+
+
+class OcrPdfPagesRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(Config, OCR_DPI=200, OCR_RETRY_DPI=300, OCR_RETRY_CONFIDENCE=60.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_mean_confidence_none_without_confident_words(self):
+        self.assertIsNone(extractor.mean_tesseract_confidence(None))
+        self.assertIsNone(extractor.mean_tesseract_confidence(_tess_data([-1, 0, '-1'])))
+        self.assertEqual(extractor.mean_tesseract_confidence(_tess_data([-1, 40, 80])), 60.0)
+
+    def test_page_without_confident_words_is_not_retried(self):
+        pages = [(b'blank', 1), (b'text', 2)]
+        page_ocr = [("", _tess_data([-1, 0])), ("text", _tess_data([95, 90]))]
+
+        with mock.patch.object(extractor, 'pdf_bytes_to_images', return_value=list(pages)) as to_images, \
+                mock.patch.object(extractor, 'extract_pages_ocr', return_value=list(page_ocr)):
+            images, ocr = extractor.ocr_pdf_pages(b'%PDF')
+
+        to_images.assert_called_once_with(b'%PDF', dpi=200)
+        self.assertEqual(images, pages)
+        self.assertEqual(ocr, page_ocr)
+
+    def test_weak_page_is_retried_and_keeps_better_result(self):
+        pages = [(b'weak', 1), (b'blank', 2)]
+        page_ocr = [("weak", _tess_data([30])), ("", _tess_data([-1]))]
+        hi_res = (b'weak@300', 1)
+        hi_res_ocr = ("better", _tess_data([85]))
+
+        def to_images(pdf_bytes, dpi=200, first_page=None, last_page=None):
+            return [hi_res] if dpi == 300 else list(pages)
+
+        with mock.patch.object(extractor, 'pdf_bytes_to_images', side_effect=to_images) as to_images_mock, \
+                mock.patch.object(extractor, 'extract_pages_ocr', return_value=list(page_ocr)), \
+                mock.patch.object(extractor, 'extract_image_ocr_batch', return_value=[hi_res_ocr]):
+            images, ocr = extractor.ocr_pdf_pages(b'%PDF')
+
+        # Only page 1 goes back to pdf2image; the blank page 2 is left alone
+        self.assertEqual(to_images_mock.call_count, 2)
+        to_images_mock.assert_called_with(b'%PDF', dpi=300, first_page=1, last_page=1)
+        self.assertEqual(images, [hi_res, pages[1]])
+        self.assertEqual(ocr, [hi_res_ocr, page_ocr[1]])
+
+    def test_retry_without_confident_words_keeps_original(self):
+        pages = [(b'weak', 1)]
+        page_ocr = [("weak", _tess_data([30]))]
+
+        with mock.patch.object(extractor, 'pdf_bytes_to_images',
+                               side_effect=[list(pages), [(b'weak@300', 1)]]), \
+                mock.patch.object(extractor, 'extract_pages_ocr', return_value=list(page_ocr)), \
+                mock.patch.object(extractor, 'extract_image_ocr_batch', return_value=[("", _tess_data([-1]))]):
+            images, ocr = extractor.ocr_pdf_pages(b'%PDF')
+
+        self.assertEqual(images, pages)
+        self.assertEqual(ocr, page_ocr)
+
+
+if __name__ == "__main__":
+    unittest.main()